@@ -0,0 +1,413 @@
+import json
+import os
+import secrets
+
+from Project3KeyExchange import point_addition
+
+# Elliptic curve arithmetic for y^2 = x^3 + ax + b over the integers mod p, with a proper point at infinity.
+# Affine points are (x, y) tuples like in Project3KeyExchange, and the point at infinity (the identity) is None.
+# Scalar multiplication works in Jacobian projective coordinates, where (X, Y, Z) is the affine point (X/Z^2, Y/Z^3)
+# and Z = 0 is the point at infinity. This avoids a modular inverse on every addition and doubling; only the final
+# conversion back to affine needs one. Scalars are processed in windowed non-adjacent form (wNAF), which needs about
+# log2(k) doublings and log2(k)/(w+1) additions instead of the k-1 additions of repeated point_addition.
+
+INFINITY = None
+
+# The Jacobian representation of the point at infinity.
+JACOBIAN_INFINITY = (1, 1, 0)
+
+# 'n' is the order of the base point G, if it is known. It is needed to pick secrets in generate_keypairs().
+class Curve:
+    def __init__(self, p, a, b, G=None, n=None):
+        self.p = p
+        self.a = a % p
+        self.b = b % p
+        self.G = G
+        self.n = n
+
+        if (4 * self.a**3 + 27 * self.b**2) % p == 0:
+            raise ValueError("The curve is singular (4a^3 + 27b^2 = 0 mod p)")
+
+        if G is not None and not self.is_on_curve(G):
+            raise ValueError("The base point " + str(G) + " is not on the curve")
+
+        if n is not None and (G is None or self.scalar_multiply(n, G) is not INFINITY):
+            raise ValueError("The base point " + str(G) + " does not have order " + str(n))
+
+    def __eq__(self, other):
+        return isinstance(other, Curve) and (self.p, self.a, self.b, self.G) == (other.p, other.a, other.b, other.G)
+
+    def __hash__(self):
+        return hash((self.p, self.a, self.b, self.G))
+
+    def __repr__(self):
+        return "Curve(p=" + str(self.p) + ", a=" + str(self.a) + ", b=" + str(self.b) + ", G=" + str(self.G) + ", n=" + str(self.n) + ")"
+
+    def is_on_curve(self, P):
+        if P is INFINITY:
+            return True
+
+        x, y = P
+        return (y * y - (x * x * x + self.a * x + self.b)) % self.p == 0
+
+    def negate(self, P):
+        if P is INFINITY:
+            return INFINITY
+
+        return (P[0], -P[1] % self.p)
+
+    # Affine point addition, handling the point at infinity, P + (-P), and doubling a point with y = 0.
+    def add(self, P, Q):
+        if P is INFINITY:
+            return Q
+        if Q is INFINITY:
+            return P
+
+        p = self.p
+
+        if P[0] == Q[0]:
+            if (P[1] + Q[1]) % p == 0:
+                return INFINITY
+
+            # Point doubling
+            m = (3*P[0]**2 + self.a) * pow(2*P[1], -1, p) % p
+        else:
+            # Point addition
+            m = (Q[1] - P[1]) * pow(Q[0] - P[0], -1, p) % p
+
+        x = (m**2 - P[0] - Q[0]) % p
+        y = (m*(P[0] - x) - P[1]) % p
+        return (x, y)
+
+    def to_jacobian(self, P):
+        if P is INFINITY:
+            return JACOBIAN_INFINITY
+
+        return (P[0], P[1], 1)
+
+    # Converts a Jacobian point back to affine, which needs one modular inverse.
+    def from_jacobian(self, P):
+        X, Y, Z = P
+
+        if Z % self.p == 0:
+            return INFINITY
+
+        p = self.p
+        z_inverse = pow(Z, -1, p)
+        z_inverse_squared = z_inverse * z_inverse % p
+        return (X * z_inverse_squared % p, Y * z_inverse_squared * z_inverse % p)
+
+    def jacobian_negate(self, P):
+        return (P[0], -P[1] % self.p, P[2])
+
+    # Jacobian point doubling for any a (dbl-2007-bl from the Explicit-Formulas Database).
+    def jacobian_double(self, P):
+        X1, Y1, Z1 = P
+        p = self.p
+
+        if Z1 == 0 or Y1 == 0:
+            return JACOBIAN_INFINITY
+
+        XX = X1 * X1 % p
+        YY = Y1 * Y1 % p
+        YYYY = YY * YY % p
+        ZZ = Z1 * Z1 % p
+        S = 4 * X1 * YY % p
+        M = (3 * XX + self.a * ZZ * ZZ) % p
+
+        X3 = (M * M - 2 * S) % p
+        Y3 = (M * (S - X3) - 8 * YYYY) % p
+        Z3 = 2 * Y1 * Z1 % p
+        return (X3, Y3, Z3)
+
+    # Jacobian point addition (add-2007-bl), falling back to doubling when both points are the same, and returning
+    # the point at infinity for P + (-P).
+    def jacobian_add(self, P, Q):
+        X1, Y1, Z1 = P
+        X2, Y2, Z2 = Q
+        p = self.p
+
+        if Z1 == 0:
+            return Q
+        if Z2 == 0:
+            return P
+
+        Z1Z1 = Z1 * Z1 % p
+        Z2Z2 = Z2 * Z2 % p
+        U1 = X1 * Z2Z2 % p
+        U2 = X2 * Z1Z1 % p
+        S1 = Y1 * Z2 * Z2Z2 % p
+        S2 = Y2 * Z1 * Z1Z1 % p
+
+        if U1 == U2:
+            if S1 != S2:
+                return JACOBIAN_INFINITY
+            return self.jacobian_double(P)
+
+        H = (U2 - U1) % p
+        R = (S2 - S1) % p
+        HH = H * H % p
+        HHH = H * HH % p
+        V = U1 * HH % p
+
+        X3 = (R * R - HHH - 2 * V) % p
+        Y3 = (R * (V - X3) - S1 * HHH) % p
+        Z3 = Z1 * Z2 * H % p
+        return (X3, Y3, Z3)
+
+    # Computes k*P and returns it in Jacobian coordinates. See scalar_multiply().
+    def scalar_multiply_jacobian(self, k, P, window=4):
+        if k < 0:
+            return self.scalar_multiply_jacobian(-k, self.negate(P), window)
+
+        if k == 0 or P is INFINITY:
+            return JACOBIAN_INFINITY
+
+        # Precompute the odd multiples P, 3P, 5P, ..., (2^(w-1) - 1)P.
+        P_jacobian = self.to_jacobian(P)
+        double_P = self.jacobian_double(P_jacobian)
+        odd_multiples = [P_jacobian]
+        for _ in range((1 << (window - 2)) - 1):
+            odd_multiples.append(self.jacobian_add(odd_multiples[-1], double_P))
+
+        R = JACOBIAN_INFINITY
+        for digit in reversed(wnaf(k, window)):
+            R = self.jacobian_double(R)
+
+            if digit > 0:
+                R = self.jacobian_add(R, odd_multiples[digit >> 1])
+            elif digit < 0:
+                R = self.jacobian_add(R, self.jacobian_negate(odd_multiples[-digit >> 1]))
+
+        return R
+
+    # Computes k*P using windowed NAF in Jacobian coordinates, returning an affine point (or INFINITY).
+    def scalar_multiply(self, k, P, window=4):
+        return self.from_jacobian(self.scalar_multiply_jacobian(k, P, window))
+
+# Returns the width-w non-adjacent form of k, least significant digit first. Every non-zero digit is odd and less than
+# 2^(w-1) in absolute value, and any w consecutive digits hold at most one non-zero digit.
+def wnaf(k, window=4):
+    if window < 2:
+        raise ValueError("The wNAF window must be at least 2, got " + str(window))
+
+    digits = []
+    modulus = 1 << window
+    half = modulus >> 1
+
+    while k > 0:
+        if k & 1:
+            digit = k % modulus
+            if digit >= half:
+                digit -= modulus
+            k -= digit
+        else:
+            digit = 0
+
+        digits.append(digit)
+        k >>= 1
+
+    return digits
+
+# Converts many Jacobian points to affine with a single modular inverse, using Montgomery's simultaneous inversion
+# trick: the running products of the Z coordinates are inverted once, and each individual inverse is then recovered
+# by multiplying back through the running products.
+def batch_from_jacobian(curve, points):
+    p = curve.p
+    products = []
+    product = 1
+
+    for X, Y, Z in points:
+        if Z % p != 0:
+            product = product * Z % p
+        products.append(product)
+
+    inverse = pow(product, -1, p)
+    affine_points = [INFINITY] * len(points)
+
+    for i in range(len(points) - 1, -1, -1):
+        X, Y, Z = points[i]
+        if Z % p == 0:
+            continue
+
+        # inverse is currently 1 / (Z_0 * ... * Z_i), so multiplying by the product before i gives 1 / Z_i.
+        previous_product = products[i - 1] if i > 0 else 1
+        z_inverse = inverse * previous_product % p
+        inverse = inverse * Z % p
+
+        z_inverse_squared = z_inverse * z_inverse % p
+        affine_points[i] = (X * z_inverse_squared % p, Y * z_inverse_squared * z_inverse % p)
+
+    return affine_points
+
+# A fixed-base window table for a curve's generator. Entry [i][j] is j * 2^(window * i) * G, so k*G is the sum of one
+# entry per window of k's bits, with no doublings at all. Entries are stored in affine form.
+class FixedBaseTable:
+    def __init__(self, curve, window, scalar_bits, points):
+        self.curve = curve
+        self.window = window
+        self.scalar_bits = scalar_bits
+        self.points = points
+
+    @classmethod
+    def build(cls, curve, window=4, scalar_bits=None):
+        if curve.G is None:
+            raise ValueError("The curve has no base point")
+
+        scalar_bits = curve.p.bit_length() + 1 if scalar_bits is None else scalar_bits
+        window_count = -(-scalar_bits // window)
+
+        jacobian_points = []
+        base = curve.to_jacobian(curve.G)
+        for _ in range(window_count):
+            row = [JACOBIAN_INFINITY]
+            for _ in range((1 << window) - 1):
+                row.append(curve.jacobian_add(row[-1], base))
+            jacobian_points.extend(row)
+
+            for _ in range(window):
+                base = curve.jacobian_double(base)
+
+        # Normalize every entry to affine with a single inversion.
+        affine_points = batch_from_jacobian(curve, jacobian_points)
+        rows = [affine_points[i:i + (1 << window)] for i in range(0, len(affine_points), 1 << window)]
+
+        return cls(curve, window, scalar_bits, rows)
+
+    # Computes k*G in Jacobian coordinates using the table, falling back to scalar_multiply_jacobian() for scalars
+    # which are too large for the table.
+    def multiply_jacobian(self, k):
+        if k < 0 or k.bit_length() > self.scalar_bits:
+            return self.curve.scalar_multiply_jacobian(k, self.curve.G)
+
+        curve = self.curve
+        mask = (1 << self.window) - 1
+        R = JACOBIAN_INFINITY
+
+        for row in self.points:
+            if k == 0:
+                break
+
+            digit = k & mask
+            if digit != 0:
+                R = curve.jacobian_add(R, curve.to_jacobian(row[digit]))
+            k >>= self.window
+
+        return R
+
+    def multiply(self, k):
+        return self.curve.from_jacobian(self.multiply_jacobian(k))
+
+    def to_dict(self):
+        return {
+            "p": self.curve.p, "a": self.curve.a, "b": self.curve.b, "G": list(self.curve.G),
+            "window": self.window, "scalar_bits": self.scalar_bits,
+            "points": [[None if P is INFINITY else list(P) for P in row] for row in self.points],
+        }
+
+    def save(self, path):
+        with open(path, "w") as table_file:
+            json.dump(self.to_dict(), table_file)
+
+    # Loads a table saved with save(), checking that it was built for the given curve.
+    @classmethod
+    def load(cls, path, curve):
+        with open(path) as table_file:
+            values = json.load(table_file)
+
+        if (values["p"], values["a"], values["b"], tuple(values["G"])) != (curve.p, curve.a, curve.b, curve.G):
+            raise ValueError("The table in " + str(path) + " was built for a different curve")
+
+        points = [[INFINITY if P is None else tuple(P) for P in row] for row in values["points"]]
+        return cls(curve, values["window"], values["scalar_bits"], points)
+
+# Fixed-base tables built so far, keyed by (curve, window, scalar_bits), so a table is only built once per curve.
+fixed_base_tables = {}
+
+# Returns the fixed-base table for the curve's generator, building it (or loading it from 'path' if that file exists)
+# the first time it is requested. If 'path' is given and does not exist, the built table is saved there.
+def get_fixed_base_table(curve, window=4, scalar_bits=None, path=None):
+    scalar_bits = curve.p.bit_length() + 1 if scalar_bits is None else scalar_bits
+    cache_key = (curve, window, scalar_bits)
+
+    table = fixed_base_tables.get(cache_key)
+    if table is not None:
+        return table
+
+    if path is not None and os.path.exists(path):
+        table = FixedBaseTable.load(path, curve)
+
+        if (table.window, table.scalar_bits) != (window, scalar_bits):
+            table = None
+
+    if table is None:
+        table = FixedBaseTable.build(curve, window, scalar_bits)
+
+        if path is not None:
+            table.save(path)
+
+    fixed_base_tables[cache_key] = table
+    return table
+
+# Generates 'count' keypairs at once, returning a list of (secret, public point) tuples. Secrets are drawn from
+# [1, n) where n is the order of G (curve.n unless it is passed in), so every secret gives a different public key and
+# none gives the point at infinity. Public keys are computed with the fixed-base table and converted to affine together
+# with a single inversion.
+def generate_keypairs(count, curve, n=None, table=None):
+    n = curve.n if n is None else n
+    if n is None:
+        raise ValueError("The order of G must be known to generate keypairs, pass it as n or when creating the curve")
+
+    table = get_fixed_base_table(curve) if table is None else table
+
+    secret_values = [secrets.randbelow(n - 1) + 1 for _ in range(count)]
+    public_points = batch_from_jacobian(curve, [table.multiply_jacobian(secret) for secret in secret_values])
+
+    if INFINITY in public_points:
+        raise ValueError(str(n) + " is not the order of G, as a secret below it gave the point at infinity")
+
+    return list(zip(secret_values, public_points))
+
+# The curve used by Project3KeyExchange. G has order 161, which is also the number of points on the curve.
+toy_curve = Curve(167, 11, 19, (2, 7), 161)
+
+# Checks scalar_multiply() against repeated point_addition() for k = 1, 2, ... until point_addition() reaches
+# P + (-P), which it cannot handle as it has no point at infinity. Returns the number of multiples checked.
+def verify_against_point_addition(curve=toy_curve, P=None):
+    P = curve.G if P is None else P
+
+    R = P
+    k = 1
+    while True:
+        for window in (2, 3, 4, 5):
+            if curve.scalar_multiply(k, P, window) != R:
+                raise AssertionError("scalar_multiply(" + str(k) + ", " + str(P) + ") does not match point_addition")
+
+        if curve.add(R, P) is INFINITY:
+            # The next multiple is the point at infinity, so P has order k + 1.
+            if curve.scalar_multiply(k + 1, P) is not INFINITY:
+                raise AssertionError("scalar_multiply(" + str(k + 1) + ", " + str(P) + ") should be the point at infinity")
+            return k
+
+        R = point_addition(R, P, curve.a, curve.p)
+        k += 1
+
+def main():
+    checked = verify_against_point_addition()
+    print("scalar_multiply matches point_addition for the first " + str(checked) + " multiples of G")
+
+    A_secret = 12
+    B_secret = 31
+
+    R1 = toy_curve.scalar_multiply(A_secret, toy_curve.G)
+    R2 = toy_curve.scalar_multiply(B_secret, toy_curve.G)
+    print("Alice sends: ", R1)
+    print("Bob sends: ", R2)
+    print("Alice computes shared key: ", toy_curve.scalar_multiply(A_secret, R2))
+    print("Bob computes shared key: ", toy_curve.scalar_multiply(B_secret, R1))
+
+    for secret, public in generate_keypairs(3, toy_curve):
+        print("Generated keypair: ", secret, public)
+
+if __name__ == "__main__":
+    main()
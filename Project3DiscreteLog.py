@@ -0,0 +1,297 @@
+import math
+import random
+import sys
+import time
+
+from Project3KeyExchange import point_addition, p, a, b, G
+from Project3Curve import Curve, INFINITY
+
+# Tools for auditing small curves: the number of points on the curve, the order of a point, and two O(sqrt(n))
+# discrete log solvers which find k from Q = k*P. Baby-step giant-step keeps about sqrt(n/2) points in a hash index,
+# while Pollard's rho only keeps a few points but takes a random number of steps (about 1.25 * sqrt(n) on average).
+# Both walk the group with point_addition, so every step costs one modular inverse.
+#
+# Counting points takes O(p) time and memory, so it is only practical for small curves (up to around 2^28). The solvers
+# themselves handle orders up to about 2^40, but for curves that large the order n must be passed in, as working it
+# out would need the point count.
+
+# The largest prime count_points() will work with, as it allocates a byte for every residue.
+maximum_counted_prime = 1 << 28
+
+# Adds two affine points with point_addition, handling the point at infinity and P + (-P), which point_addition cannot.
+def add_points(P, Q, a, p):
+    if P is INFINITY:
+        return Q
+    if Q is INFINITY:
+        return P
+
+    if P[0] == Q[0] and (P[1] + Q[1]) % p == 0:
+        return INFINITY
+
+    return point_addition(P, Q, a, p)
+
+# Returns a table where entry r is the number of square roots of r mod p (0, 1 or 2), so the Legendre symbol of r is
+# table[r] - 1. Built by squaring half of the residues, which is much cheaper than a modular exponentiation per x.
+def quadratic_residue_table(p):
+    table = bytearray(p)
+    table[0] = 1
+
+    for y in range(1, (p + 1) // 2):
+        table[y * y % p] = 2
+
+    return table
+
+# Counts the points on y^2 = x^3 + ax + b mod p, including the point at infinity. Every x contributes one point for
+# each square root of x^3 + ax + b, which is looked up in the quadratic residue table.
+def count_points(p, a, b):
+    if p > maximum_counted_prime:
+        raise ValueError("Counting the points of a curve over a " + str(p.bit_length()) + " bit prime is too slow, pass the order or point count instead")
+
+    table = quadratic_residue_table(p)
+    return 1 + sum(table[(x * x * x + a * x + b) % p] for x in range(p))
+
+# Returns the prime factors of n with their exponents, by trial division.
+def factorize(n):
+    factors = {}
+    divisor = 2
+
+    while divisor * divisor <= n:
+        while n % divisor == 0:
+            factors[divisor] = factors.get(divisor, 0) + 1
+            n //= divisor
+        divisor += 1 if divisor == 2 else 2
+
+    if n > 1:
+        factors[n] = factors.get(n, 0) + 1
+
+    return factors
+
+def is_prime(n):
+    return n > 1 and factorize(n) == {n: 1}
+
+# Returns the order of P, the smallest k > 0 with k*P at infinity. The order divides the number of points on the
+# curve, so it is found by dividing the prime factors out of the point count while the multiple stays at infinity.
+# The order of the curve's base point is returned directly if the curve knows it. For large curves the point count
+# must be passed in.
+def order_of_point(curve, P, point_count=None):
+    if P == curve.G and curve.n is not None:
+        return curve.n
+
+    if point_count is None:
+        point_count = count_points(curve.p, curve.a, curve.b)
+
+    if curve.scalar_multiply(point_count, P) is not INFINITY:
+        raise ValueError("The point " + str(P) + " is not on a curve with " + str(point_count) + " points")
+
+    order = point_count
+    for prime in factorize(point_count):
+        while order % prime == 0 and curve.scalar_multiply(order // prime, P) is INFINITY:
+            order //= prime
+
+    return order
+
+# Finds k in [0, n) with k*P = Q for brute force, for tiny orders where the other solvers are not worth setting up.
+def brute_force_discrete_log(curve, P, Q, n):
+    R = INFINITY
+
+    for k in range(n):
+        if R == Q:
+            return k
+        R = add_points(R, P, curve.a, curve.p)
+
+    return None
+
+# Finds k in [0, n) with k*P = Q, where n is the order of P, or returns None if Q is not a multiple of P. If n is not
+# given it is found with order_of_point(), which counts the points on the curve, so it must be given for large curves.
+# The baby steps index the x coordinates of jP for j = 1 .. m, with the sign of j recording the parity of y. As jP and
+# -jP share an x coordinate, one lookup matches both, so a giant step of 2m + 1 covers Q - iP * (2m + 1) = tP for
+# every t in [-m, m]. This halves the giant steps for the same index size.
+def baby_step_giant_step(curve, P, Q, n=None):
+    n = order_of_point(curve, P) if n is None else n
+
+    if n < 8:
+        return brute_force_discrete_log(curve, P, Q, n)
+
+    a, p = curve.a, curve.p
+    m = math.isqrt(n // 2) + 1
+
+    index = {}
+    R = P
+    for j in range(1, m + 1):
+        index.setdefault(R[0], j if R[1] & 1 == 0 else -j)
+        R = add_points(R, P, a, p)
+
+    stride = 2 * m + 1
+    giant_step = curve.negate(curve.scalar_multiply(stride, P))
+
+    R = Q
+    for i in range(n // stride + 2):
+        if R is INFINITY:
+            return i * stride % n
+
+        j = index.get(R[0])
+        if j is not None:
+            t = j if R[1] & 1 == 0 else -j
+            return (i * stride + t) % n
+
+        R = add_points(R, giant_step, a, p)
+
+    return None
+
+# Returns every k in [0, n) with coefficient * k = value (mod n).
+def solve_linear_congruence(coefficient, value, n):
+    divisor = math.gcd(coefficient, n)
+
+    if value % divisor != 0:
+        return []
+
+    reduced = n // divisor
+    k = (value // divisor) * pow(coefficient // divisor, -1, reduced) % reduced
+    return [k + t * reduced for t in range(divisor)]
+
+# Finds k in [0, n) with k*P = Q using Pollard's rho with an r-adding walk and Brent's cycle detection, so only two
+# points are kept in memory. Each point in the walk is known as cP + dQ, and when the walk meets itself the two
+# representations give (d1 - d2) k = c2 - c1 (mod n). If n is not prime this has several solutions, which are all
+# checked. A walk which gives no answer is restarted with new random multipliers, up to 'attempts' times. As with
+# baby_step_giant_step(), n must be given for large curves.
+def pollard_rho(curve, P, Q, n=None, partitions=16, attempts=20, seed=None):
+    n = order_of_point(curve, P) if n is None else n
+
+    if n < 64:
+        return brute_force_discrete_log(curve, P, Q, n)
+
+    a, p = curve.a, curve.p
+    generator = random.Random(seed)
+
+    def combine(c, d):
+        return curve.add(curve.scalar_multiply(c, P), curve.scalar_multiply(d, Q))
+
+    for _ in range(attempts):
+        multipliers = [(generator.randrange(n), generator.randrange(n)) for _ in range(partitions)]
+        steps = [combine(c, d) for c, d in multipliers]
+
+        def step(R, c, d):
+            j = 0 if R is INFINITY else R[0] % partitions
+            return add_points(R, steps[j], a, p), (c + multipliers[j][0]) % n, (d + multipliers[j][1]) % n
+
+        c, d = generator.randrange(n), generator.randrange(n)
+        tortoise = (combine(c, d), c, d)
+        hare = step(*tortoise)
+        power = length = 1
+
+        while tortoise[0] != hare[0]:
+            if power == length:
+                tortoise = hare
+                power *= 2
+                length = 0
+
+            hare = step(*hare)
+            length += 1
+
+        _, c1, d1 = tortoise
+        _, c2, d2 = hare
+
+        # Too many candidates means the walk collided trivially, so start again instead.
+        if (d1 - d2) % n == 0 or math.gcd(d1 - d2, n) > 1024:
+            continue
+
+        for k in solve_linear_congruence((d1 - d2) % n, (c2 - c1) % n, n):
+            if curve.scalar_multiply(k, P) == Q:
+                return k
+
+    return None
+
+# Finds a point on the curve with the given x coordinate, or returns None. Only works for p = 3 (mod 4), where a square
+# root of r is r^((p+1)/4).
+def lift_x(curve, x):
+    value = (x * x * x + curve.a * x + curve.b) % curve.p
+    y = pow(value, (curve.p + 1) // 4, curve.p)
+    return (x, y) if y * y % curve.p == value else None
+
+# Generates a random curve over a prime of about 'bits' bits with p = 3 (mod 4), along with a point P on it and its
+# order. Tries again until the order is at least a quarter of the number of points. Above supersingular_bits, the
+# points cannot be counted, so the curve is y^2 = x^3 + ax instead, which has exactly p + 1 points for p = 3 (mod 4).
+def generate_benchmark_curve(bits, generator):
+    p = (1 << bits) + generator.randrange(1 << max(bits - 2, 1))
+    p += 3 - p % 4
+    while not is_prime(p):
+        p += 4
+
+    while True:
+        if bits > supersingular_bits:
+            a, b = generator.randrange(1, p), 0
+            point_count = p + 1
+        else:
+            a, b = generator.randrange(p), generator.randrange(p)
+            if (4 * a**3 + 27 * b**2) % p == 0:
+                continue
+            point_count = count_points(p, a, b)
+
+        curve = Curve(p, a, b)
+
+        P = None
+        while P is None:
+            P = lift_x(curve, generator.randrange(p))
+
+        n = order_of_point(curve, P, point_count)
+        if 4 * n >= point_count:
+            return curve, P, n
+
+# Curves with more bits than this are generated with a known point count instead of counting the points.
+supersingular_bits = 24
+
+# The benchmark curve sizes. The 32 and 40 bit curves check the solvers near the largest orders they are meant for.
+benchmark_bits = (12, 16, 20, 32, 40)
+
+# Times a discrete log solver on random curves of the given sizes, returning a list of results with the order of the
+# point, the time taken, and whether the solver found the secret.
+def benchmark_discrete_log(solver, bits_list=benchmark_bits, seed=0):
+    generator = random.Random(seed)
+    results = []
+
+    for bits in bits_list:
+        curve, P, n = generate_benchmark_curve(bits, generator)
+        secret = generator.randrange(1, n)
+        Q = curve.scalar_multiply(secret, P)
+
+        start = time.perf_counter()
+        k = solver(curve, P, Q, n)
+        seconds = time.perf_counter() - start
+
+        results.append({"bits": bits, "p": curve.p, "order": n, "seconds": seconds, "solved": k == secret})
+
+    return results
+
+def benchmark_baby_step_giant_step(bits_list=benchmark_bits, seed=0):
+    return benchmark_discrete_log(baby_step_giant_step, bits_list, seed)
+
+def benchmark_pollard_rho(bits_list=benchmark_bits, seed=0):
+    return benchmark_discrete_log(lambda curve, P, Q, n: pollard_rho(curve, P, Q, n, seed=seed), bits_list, seed)
+
+def print_benchmark(name, results):
+    for result in results:
+        print("%s: %d bit curve, order %d, %.3fs, solved: %s" % (name, result["bits"], result["order"], result["seconds"], result["solved"]))
+
+# Audits the curve from Project3KeyExchange, recovers Alice's secret from the point she sends, then benchmarks both
+# solvers. Curve sizes for the benchmark can be given on the command line.
+def main():
+    curve = Curve(p, a, b, G)
+    point_count = count_points(p, a, b)
+    n = order_of_point(curve, G, point_count)
+    print("The curve has " + str(point_count) + " points and G has order " + str(n))
+
+    # Alice's point, computed the same way as in Project3KeyExchange.
+    A_secret = 12
+    R1 = G
+    for i in range(1, A_secret):
+        R1 = point_addition(R1, G, a, p)
+
+    print("Baby-step giant-step recovers A_secret =", baby_step_giant_step(curve, G, R1, n))
+    print("Pollard's rho recovers A_secret =", pollard_rho(curve, G, R1, n))
+
+    bits_list = [int(bits) for bits in sys.argv[1:]] or benchmark_bits
+    print_benchmark("Baby-step giant-step", benchmark_baby_step_giant_step(bits_list))
+    print_benchmark("Pollard's rho", benchmark_pollard_rho(bits_list))
+
+if __name__ == "__main__":
+    main()
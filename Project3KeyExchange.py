@@ -16,38 +16,42 @@ a = 11
 b = 19
 G = (2, 7)
 
-# Alice's secret value
-A_secret = 12
-
-# Bob's secret value
-B_secret = 31
-
-# Alice computes a*G
-R1 = G
-for i in range(1, A_secret):
-    R1 = point_addition(R1, G, a, p)
-    
-# Alice sends R1 to Bob
-print("Alice sends: ", R1)
-
-# Bob computes b*G
-R2 = G
-for i in range(1, B_secret):
-    R2 = point_addition(R2, G, a, p)
-
-# Bob sends R2 to Alice
-print("Bob sends: ", R2)
-
-# Alice computes a*R2
-shared_secret1 = R2
-for i in range(1, A_secret):
-    shared_secret1 = point_addition(shared_secret1, R2, a, p)
-
-# Bob computes b*R1
-shared_secret2 = R1
-for i in range(1, B_secret):
-    shared_secret2 = point_addition(shared_secret2, R1, a, p)
-
-print("Alice computes shared key: ", shared_secret1)
-print("Bob computes shared key: ", shared_secret2)
-print("Shared key established!")
+def main():
+    # Alice's secret value
+    A_secret = 12
+
+    # Bob's secret value
+    B_secret = 31
+
+    # Alice computes a*G
+    R1 = G
+    for i in range(1, A_secret):
+        R1 = point_addition(R1, G, a, p)
+
+    # Alice sends R1 to Bob
+    print("Alice sends: ", R1)
+
+    # Bob computes b*G
+    R2 = G
+    for i in range(1, B_secret):
+        R2 = point_addition(R2, G, a, p)
+
+    # Bob sends R2 to Alice
+    print("Bob sends: ", R2)
+
+    # Alice computes a*R2
+    shared_secret1 = R2
+    for i in range(1, A_secret):
+        shared_secret1 = point_addition(shared_secret1, R2, a, p)
+
+    # Bob computes b*R1
+    shared_secret2 = R1
+    for i in range(1, B_secret):
+        shared_secret2 = point_addition(shared_secret2, R1, a, p)
+
+    print("Alice computes shared key: ", shared_secret1)
+    print("Bob computes shared key: ", shared_secret2)
+    print("Shared key established!")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,198 @@
+import mmap
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+# NumPy is optional. Without it the scrubbed regions are translated with bytes.translate, which gives the same output.
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# A port of Project4/stegoDestroy.c which works on whole regions of the file instead of one character at a time. The
+# input is memory mapped, and every byte of a region which has to be scrubbed is passed through a 256 entry lookup table
+# built from removeStego, so each region costs one vectorized pass. Many files can be scrubbed at once across a
+# process pool.
+#
+# The file layout is the same as in stegoDestroy.c: the first START_FROM bytes are left alone, followed by a 64 byte
+# stego header (eight bytes per header byte, one bit in the lowest bit of each, which must read 0xa5), 27 inserted
+# bytes, and the stego data up to the end of the file.
+
+# Same as START_FROM in Project4/stego.h.
+START_FROM = 100
+
+headerLength = 64
+insertedLength = 27
+headerMagic = 0xa5
+
+# The defaults used by stegoDestroy.c.
+keepStegoHeader = False
+keepInsertedBits = False
+keepStegoData = False
+exitOnInvalidStegoHeader = True
+roundToNearest = True
+
+# The number of bytes copied or scrubbed at a time, which bounds the memory used for very large files.
+chunkSize = 1 << 26
+
+# Removes any stego data from a byte value (0 to 255), even if that data is not actually stego data. With
+# roundToNearest the value is rounded to 255 (from 254 or 255) or 0 (anything else), which restores a monochromatic
+# image. Otherwise the lowest bit is always set.
+def removeStego(value, roundToNearest=roundToNearest):
+    if roundToNearest:
+        return 255 if value >= 254 else 0
+
+    return value | 0b00000001
+
+# Returns removeStego applied to every byte value, as a lookup table.
+def getStegoTable(roundToNearest=roundToNearest):
+    return bytes(removeStego(value, roundToNearest) for value in range(256))
+
+# Returns the (start, end, scrub) segments of a file of 'fileSize' bytes, where 'scrub' says whether the bytes from
+# start to end have removeStego applied. The last inserted byte is also scrubbed as stego data, because in
+# stegoDestroy.c the data section starts on the same character that ends the inserted bits.
+def getSegments(fileSize, keepStegoHeader=keepStegoHeader, keepInsertedBits=keepInsertedBits, keepStegoData=keepStegoData, startFrom=START_FROM):
+    headerEnd = startFrom + headerLength
+    insertedEnd = headerEnd + insertedLength
+    dataStart = insertedEnd - 1
+
+    def isScrubbed(index):
+        if startFrom <= index < headerEnd:
+            return not keepStegoHeader
+
+        scrubbed = False
+        if headerEnd <= index < insertedEnd:
+            scrubbed = not keepInsertedBits
+        if index >= dataStart:
+            scrubbed = scrubbed or not keepStegoData
+        return scrubbed
+
+    boundaries = sorted({0, fileSize} | {boundary for boundary in (startFrom, headerEnd, dataStart, insertedEnd) if 0 < boundary < fileSize})
+
+    segments = []
+    for start, end in zip(boundaries, boundaries[1:]):
+        scrub = isScrubbed(start)
+
+        # Merge with the previous segment if it is treated the same way.
+        if len(segments) > 0 and segments[-1][2] == scrub:
+            segments[-1] = (segments[-1][0], end, scrub)
+        else:
+            segments.append((start, end, scrub))
+
+    return segments
+
+# Reads the stego header from the lowest bit of each header byte, in the same way as stegoRead. Returns the value of
+# every complete header byte (each should be 0xa5).
+def readStegoHeader(data, startFrom=START_FROM):
+    header = bytes(data[startFrom:startFrom + headerLength])
+    values = []
+
+    for i in range(0, len(header) - 7, 8):
+        ttt = 0
+        for j in range(8):
+            ttt ^= (header[i + j] & 0x1) << j
+        values.append(ttt)
+
+    return values
+
+# Copies input[start:end] to output[start:end], applying the lookup table to the bytes on the way if 'scrub' is set.
+def copySegment(inputMap, outputMap, start, end, scrub, table):
+    if numpy is not None and scrub:
+        tableArray = numpy.frombuffer(table, dtype=numpy.uint8)
+        outputArray = numpy.frombuffer(outputMap, dtype=numpy.uint8)
+
+    for chunkStart in range(start, end, chunkSize):
+        chunkEnd = min(chunkStart + chunkSize, end)
+
+        if not scrub:
+            outputMap[chunkStart:chunkEnd] = inputMap[chunkStart:chunkEnd]
+        elif numpy is not None:
+            inputArray = numpy.frombuffer(inputMap, dtype=numpy.uint8, count=chunkEnd - chunkStart, offset=chunkStart)
+            numpy.take(tableArray, inputArray, out=outputArray[chunkStart:chunkEnd])
+        else:
+            outputMap[chunkStart:chunkEnd] = inputMap[chunkStart:chunkEnd].translate(table)
+
+    if numpy is not None and scrub:
+        # Release the views of the output map so it can be closed.
+        del outputArray
+
+# Scrubs the stego data from the file at 'inputPath' and writes the result to 'outputPath', with the same options as
+# stegoDestroy.c. If the stego header is invalid a ValueError is raised before anything is written, unless
+# exitOnInvalidStegoHeader is False, in which case every invalid header byte is reported on stderr and the file is
+# scrubbed anyway. Returns the header bytes which were invalid.
+def scrubFile(inputPath, outputPath, keepStegoHeader=keepStegoHeader, keepInsertedBits=keepInsertedBits, keepStegoData=keepStegoData,
+              exitOnInvalidStegoHeader=exitOnInvalidStegoHeader, roundToNearest=roundToNearest, startFrom=START_FROM):
+    with open(inputPath, "rb") as inputFile:
+        fileSize = os.fstat(inputFile.fileno()).st_size
+        inputMap = mmap.mmap(inputFile.fileno(), 0, access=mmap.ACCESS_READ) if fileSize > 0 else b""
+
+        try:
+            invalidValues = [ttt for ttt in readStegoHeader(inputMap, startFrom) if ttt != headerMagic]
+
+            for ttt in invalidValues:
+                if exitOnInvalidStegoHeader:
+                    raise ValueError("File " + str(inputPath) + " does not contain stego data that I can read. ttt=" + str(ttt))
+                print("Error --- file " + str(inputPath) + " does not contain stego data that I can read. ttt=" + str(ttt), file=sys.stderr)
+
+            table = getStegoTable(roundToNearest)
+            segments = getSegments(fileSize, keepStegoHeader, keepInsertedBits, keepStegoData, startFrom)
+
+            with open(outputPath, "w+b") as outputFile:
+                if fileSize == 0:
+                    return invalidValues
+
+                outputFile.truncate(fileSize)
+
+                with mmap.mmap(outputFile.fileno(), fileSize, access=mmap.ACCESS_WRITE) as outputMap:
+                    for start, end, scrub in segments:
+                        copySegment(inputMap, outputMap, start, end, scrub, table)
+        finally:
+            if isinstance(inputMap, mmap.mmap):
+                inputMap.close()
+
+    return invalidValues
+
+# Runs scrubFile in a worker process, returning the error message instead of raising it so one bad file does not stop
+# the others.
+def scrubFileWorker(inputPath, outputPath, options):
+    try:
+        scrubFile(inputPath, outputPath, **options)
+    except (OSError, ValueError) as error:
+        return str(error)
+
+    return None
+
+# Scrubs many (inputPath, outputPath) pairs across 'jobs' processes. Options are passed on to scrubFile. Returns a list
+# of (inputPath, error) pairs in the same order, where error is None if the file was scrubbed.
+def scrubFiles(pathPairs, jobs=None, **options):
+    jobs = jobs or os.cpu_count() or 1
+    pathPairs = list(pathPairs)
+
+    if jobs <= 1 or len(pathPairs) <= 1:
+        errors = [scrubFileWorker(inputPath, outputPath, options) for inputPath, outputPath in pathPairs]
+    else:
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            errors = list(executor.map(scrubFileWorker, [inputPath for inputPath, _ in pathPairs], [outputPath for _, outputPath in pathPairs], [options] * len(pathPairs)))
+
+    return [(inputPath, error) for (inputPath, _), error in zip(pathPairs, errors)]
+
+def main():
+    if len(sys.argv) < 3 or len(sys.argv) % 2 == 0:
+        print("\nUsage: %s stegoImage outData [stegoImage outData ...]\n" % sys.argv[0], file=sys.stderr)
+        print("where stegoImage == filename for image containing stego data", file=sys.stderr)
+        print("      outData == data read from stegoImage file\n", file=sys.stderr)
+        return 0
+
+    pathPairs = list(zip(sys.argv[1::2], sys.argv[2::2]))
+    failed = 0
+
+    for inputPath, error in scrubFiles(pathPairs):
+        if error is not None:
+            print("\nError --- " + error + "\n", file=sys.stderr)
+            failed += 1
+
+    return 1 if failed > 0 else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,251 @@
+import argparse
+import json
+import platform
+import random
+import sys
+import time
+import tracemalloc
+
+import project01Decryptor
+import project02A51
+import project02TEA
+import Project3Curve
+import Project3KeyExchange
+
+# Benchmarks for the cipher engines in this project. Every benchmark is timed for at least a minimum time, then run once
+# more under tracemalloc to find its peak memory use (tracemalloc slows everything down, so it is kept out of the
+# timing). Results are reported as JSON with operations per second, bytes per second (for benchmarks which process a
+# payload) and peak memory, and can be compared against a baseline saved from an earlier run so a run fails when a
+# benchmark gets slower, or uses more memory, by more than a threshold.
+#
+#     python benchmark.py --save-baseline baseline.json
+#     python benchmark.py --baseline baseline.json --threshold 0.2
+
+tea_key = [0xA56BABCD, 0x00000000, 0xFFFFFFFF, 0xABCDEF01]
+tea_payload_sizes = (256, 4096, 65536)
+tea_block_sizes = (2, 8, 32)
+
+a51_key = "1010101010101010101110011001100110011001111100001111000011110000"
+a51_byte_count = 4096
+
+text_length = 100000
+substitution_key = "qwertyuiopasdfghjklzxcvbnm"
+
+ecc_secret = 100
+
+# Differences in peak memory smaller than this are ignored when comparing against a baseline, as small allocations
+# vary between runs.
+memory_tolerance = 64 * 1024
+
+def random_int_list(length, generator):
+    return [generator.getrandbits(32) for _ in range(length)]
+
+# Each setup function prepares its input and returns (operation, bytes processed by one call of the operation, or None).
+
+def setup_tea_block(function):
+    def setup():
+        block = random_int_list(2, random.Random(0))
+        return (lambda: function(block, tea_key)), 8
+    return setup
+
+def setup_tea_cipher_block_chaining(payload_size, block_size, decrypt):
+    def setup():
+        generator = random.Random(payload_size * 100 + block_size)
+        int_list = random_int_list(payload_size // 4, generator)
+        initialization_vector = random_int_list(block_size, generator)
+
+        if decrypt:
+            int_list = project02TEA.cipher_block_chaining_encrypt(int_list, tea_key, initialization_vector, block_size)
+            return (lambda: project02TEA.cipher_block_chaining_decrypt(int_list, tea_key, initialization_vector, block_size)), payload_size
+
+        return (lambda: project02TEA.cipher_block_chaining_encrypt(int_list, tea_key, initialization_vector, block_size)), payload_size
+    return setup
+
+def setup_a51_keystream(cipher_class):
+    def setup():
+        if cipher_class is project02A51.TableA51:
+            # Build the tables outside of the timing.
+            project02A51.getTables()
+        return (lambda: cipher_class(a51_key).getKeyStreamBytes(a51_byte_count)), a51_byte_count
+    return setup
+
+def setup_decrypt_text(function):
+    def setup():
+        generator = random.Random(0)
+        cipher_text = "".join(generator.choice(project01Decryptor.alphabet) for _ in range(text_length))
+        return (lambda: function(substitution_key, cipher_text)), text_length
+    return setup
+
+# Scalar multiplication by repeated point_addition, the same way as Project3KeyExchange.
+def setup_point_addition_multiply():
+    p, a, G = Project3KeyExchange.p, Project3KeyExchange.a, Project3KeyExchange.G
+
+    def multiply():
+        R = G
+        for _ in range(1, ecc_secret):
+            R = Project3KeyExchange.point_addition(R, G, a, p)
+        return R
+
+    return multiply, None
+
+def setup_curve_multiply(curve, secret):
+    def setup():
+        return (lambda: curve.scalar_multiply(secret, curve.G)), None
+    return setup
+
+# secp256k1, for scalar multiplication with realistically sized numbers.
+secp256k1 = Project3Curve.Curve(2**256 - 2**32 - 977, 0, 7, (0x79BE667EF9DCBBAC55A06295CE870B07029BFCDB2DCE28D959F2815B16F81798, 0x483ADA7726A3C4655DA4FBFC0E1108A8FD17B448A68554199C47D08FFB10D4B8))
+
+# Returns every benchmark as a (name, setup) pair.
+def get_benchmarks():
+    benchmarks = [
+        ("tea.encrypt", setup_tea_block(project02TEA.encrypt)),
+        ("tea.decrypt", setup_tea_block(project02TEA.decrypt)),
+        ("tea.encrypt_fast", setup_tea_block(project02TEA.encrypt_fast)),
+        ("tea.decrypt_fast", setup_tea_block(project02TEA.decrypt_fast)),
+    ]
+
+    for payload_size in tea_payload_sizes:
+        for block_size in tea_block_sizes:
+            for decrypt in (False, True):
+                name = "tea.cbc_" + ("decrypt" if decrypt else "encrypt") + "." + str(payload_size) + "_bytes.block_" + str(block_size)
+                benchmarks.append((name, setup_tea_cipher_block_chaining(payload_size, block_size, decrypt)))
+
+    benchmarks += [
+        ("a51.keystream", setup_a51_keystream(project02A51.A51)),
+        ("a51.keystream_table", setup_a51_keystream(project02A51.TableA51)),
+        ("substitution.decrypt_text", setup_decrypt_text(project01Decryptor.decryptText)),
+        ("substitution.decrypt_text_table", setup_decrypt_text(project01Decryptor.decryptTextTable)),
+        ("ecc.point_addition_multiply", setup_point_addition_multiply),
+        ("ecc.scalar_multiply", setup_curve_multiply(Project3Curve.toy_curve, ecc_secret)),
+        ("ecc.scalar_multiply_secp256k1", setup_curve_multiply(secp256k1, 2**255 - 19)),
+    ]
+
+    return benchmarks
+
+# Runs the operation for at least 'min_time' seconds (and at least 'min_iterations' times) after one warm up call, then
+# once more under tracemalloc if 'trace_memory' is set. Returns the statistics for the benchmark. Tracing records every
+# allocation, which makes the traced run much slower, so it can be turned off with --no-memory.
+def measure(operation, byte_count, min_time=0.5, min_iterations=3, trace_memory=True):
+    operation()
+
+    iterations = 0
+    start = time.perf_counter()
+    while True:
+        operation()
+        iterations += 1
+
+        seconds = time.perf_counter() - start
+        if seconds >= min_time and iterations >= min_iterations:
+            break
+
+    peak_memory = None
+    if trace_memory:
+        tracemalloc.start()
+        try:
+            operation()
+            _, peak_memory = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+    ops_per_second = iterations / seconds
+
+    return {
+        "iterations": iterations,
+        "seconds": seconds,
+        "ops_per_second": ops_per_second,
+        "bytes_per_second": ops_per_second * byte_count if byte_count is not None else None,
+        "peak_memory_bytes": peak_memory,
+    }
+
+# Runs every benchmark whose name contains one of 'filters' (or all of them), returning a report with the results
+# keyed by benchmark name.
+def run_benchmarks(filters=None, min_time=0.5, trace_memory=True):
+    results = {}
+
+    for name, setup in get_benchmarks():
+        if filters and not any(text in name for text in filters):
+            continue
+
+        operation, byte_count = setup()
+        results[name] = measure(operation, byte_count, min_time, trace_memory=trace_memory)
+
+    return {
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "numpy": project02TEA.numpy is not None,
+        "results": results,
+    }
+
+# Compares a report against a baseline report, returning a message for every benchmark which is more than 'threshold'
+# (a fraction) slower, or uses more than 'threshold' more peak memory. Benchmarks missing from either report are
+# skipped, as are memory comparisons when either report was run without tracing memory.
+def compare_reports(report, baseline, threshold=0.2):
+    regressions = []
+
+    for name, result in report["results"].items():
+        baseline_result = baseline["results"].get(name)
+        if baseline_result is None:
+            continue
+
+        if result["ops_per_second"] < baseline_result["ops_per_second"] * (1 - threshold):
+            regressions.append("%s: %.1f ops/s, baseline %.1f ops/s (%.0f%% slower)" % (name, result["ops_per_second"], baseline_result["ops_per_second"],
+                               100 * (1 - result["ops_per_second"] / baseline_result["ops_per_second"])))
+
+        baseline_memory = baseline_result["peak_memory_bytes"]
+        if result["peak_memory_bytes"] is None or baseline_memory is None:
+            continue
+
+        if result["peak_memory_bytes"] > baseline_memory * (1 + threshold) and result["peak_memory_bytes"] - baseline_memory > memory_tolerance:
+            regressions.append("%s: %d bytes peak memory, baseline %d bytes" % (name, result["peak_memory_bytes"], baseline_memory))
+
+    return regressions
+
+def create_argument_parser():
+    parser = argparse.ArgumentParser(description="Benchmark the cipher engines and compare against a saved baseline.")
+    parser.add_argument("filters", nargs="*", help="only run benchmarks whose name contains one of these")
+    parser.add_argument("--min-time", type=float, default=0.5, help="minimum seconds to time each benchmark for")
+    parser.add_argument("--output", help="write the JSON report to this path instead of standard output")
+    parser.add_argument("--baseline", help="compare against the JSON report at this path, failing on regressions")
+    parser.add_argument("--threshold", type=float, default=0.2, help="fraction a benchmark may regress by before failing")
+    parser.add_argument("--save-baseline", help="also write the JSON report to this path, to use as a baseline later")
+    parser.add_argument("--no-memory", action="store_true", help="do not measure peak memory with tracemalloc")
+    parser.add_argument("--list", action="store_true", help="list the benchmark names and exit")
+    return parser
+
+def main(arguments=None):
+    arguments = create_argument_parser().parse_args(arguments)
+
+    if arguments.list:
+        for name, _ in get_benchmarks():
+            print(name)
+        return 0
+
+    report = run_benchmarks(arguments.filters, arguments.min_time, not arguments.no_memory)
+    report_json = json.dumps(report, indent=2)
+
+    if arguments.output:
+        with open(arguments.output, "w") as output_file:
+            output_file.write(report_json + "\n")
+    else:
+        print(report_json)
+
+    if arguments.save_baseline:
+        with open(arguments.save_baseline, "w") as baseline_file:
+            baseline_file.write(report_json + "\n")
+
+    if arguments.baseline:
+        with open(arguments.baseline) as baseline_file:
+            baseline = json.load(baseline_file)
+
+        regressions = compare_reports(report, baseline, arguments.threshold)
+        for regression in regressions:
+            print("Regression: " + regression, file=sys.stderr)
+
+        if len(regressions) > 0:
+            return 1
+
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
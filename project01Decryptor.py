@@ -1,4 +1,5 @@
 from collections import Counter
+from functools import lru_cache
 
 alphabet = "abcdefghijklmnopqrstuvwxyz"
 
@@ -28,25 +29,57 @@ def decryptText(key, cipherText):
 
     return message
 
+#Compiles a key into a str.translate table mapping each cipher letter back to its plain letter, for both lower and
+#...upper case. Tables are cached, so a key which is used again does not need to be compiled again.
+@lru_cache(maxsize=1024)
+def compileKey(key):
+    if len(key) != 26 or ''.join(sorted(key.lower())) != alphabet:
+        raise ValueError("Key must be 26 letters of the English alphabet with no duplicates, got " + repr(key))
 
-cipherText = input("Enter Ciphertext: ")
+    key = key.lower()
+    return str.maketrans(key + key.upper(), alphabet + alphabet.upper())
 
-cipherText = cipherText.lower()
+#Same as decryptText, but using a compiled translation table instead of searching the key for every letter. Anything
+#...which is not a letter of the alphabet is passed through unchanged, and upper case letters stay upper case.
+def decryptTextTable(key, cipherText):
+    return cipherText.translate(compileKey(key))
 
-charFrequencies = Counter(cipherText)
+#Decrypts many (cipherText, key) pairs, returning the messages in the same order.
+def decryptMany(pairs):
+    return [decryptTextTable(key, cipherText) for cipherText, key in pairs]
 
-print("The character counts are: ")
-print(charFrequencies)
+#Decrypts lines one at a time with the same key, for streaming large inputs.
+def decryptLines(key, lines):
+    table = compileKey(key)
+    for line in lines:
+        yield line.translate(table)
 
-key = input("Enter a possible key: ")
+#Decrypts a file line by line into another file, so the whole file never has to be held in memory.
+def decryptFile(key, inputPath, outputPath):
+    with open(inputPath) as inputFile, open(outputPath, "w") as outputFile:
+        outputFile.writelines(decryptLines(key, inputFile))
 
-key = key.lower()
 
-while isValidKey(key) == False:
+def main():
+    cipherText = input("Enter Ciphertext: ")
+
+    cipherText = cipherText.lower()
+
+    charFrequencies = Counter(cipherText)
+
+    print("The character counts are: ")
+    print(charFrequencies)
+
     key = input("Enter a possible key: ")
 
+    key = key.lower()
+
+    while isValidKey(key) == False:
+        key = input("Enter a possible key: ")
 
-print("The decrypted message is: " + decryptText(key, cipherText))
 
+    print("The decrypted message is: " + decryptTextTable(key, cipherText))
 
 
+if __name__ == "__main__":
+    main()
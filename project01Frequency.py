@@ -0,0 +1,242 @@
+import mmap
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+from project01Decryptor import alphabet
+
+#NumPy is optional. Without it the counts are kept in lists and counted in plain Python, which gives the same results
+#...more slowly.
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+#Streaming unigram, bigram and trigram frequency analysis. Input is read in chunks and converted to arrays of letter
+#...indices (upper case letters are folded to lower case, and anything else is skipped, so n-grams run across spaces and
+#...punctuation). Each chunk is counted with bincount, and the counts of chunks, files or byte ranges counted by
+#...different processes can be merged. Merging keeps the first and last two letters of each part, so the n-grams
+#...spanning the boundary between two contiguous parts are counted exactly once.
+
+#Relative frequencies of the letters in English text.
+englishFrequencies = (0.08167, 0.01492, 0.02782, 0.04253, 0.12702, 0.02228, 0.02015, 0.06094, 0.06966, 0.00153, 0.00772, 0.04025, 0.02406,
+                      0.06749, 0.07507, 0.01929, 0.00095, 0.05987, 0.06327, 0.09056, 0.02758, 0.00978, 0.02360, 0.00150, 0.01974, 0.00074)
+
+#The number of bytes read at a time.
+chunkSize = 1 << 20
+
+letterA = ord("a")
+
+#Converts bytes or a string to letter indices (0 to 25).
+def toIndices(data):
+    if isinstance(data, str):
+        data = data.encode("utf-8")
+
+    if numpy is not None:
+        values = numpy.frombuffer(data, dtype=numpy.uint8) | 0x20
+        values = values[(values >= letterA) & (values < letterA + 26)]
+        return (values - letterA).astype(numpy.intp)
+
+    return [(value | 0x20) - letterA for value in bytes(data) if letterA <= (value | 0x20) < letterA + 26]
+
+def bincount(values, length):
+    if numpy is not None:
+        return numpy.bincount(values, minlength=length).astype(numpy.int64)
+
+    counts = [0] * length
+    for value in values:
+        counts[value] += 1
+    return counts
+
+def emptyCounts(length):
+    return numpy.zeros(length, dtype=numpy.int64) if numpy is not None else [0] * length
+
+def addCounts(first, second):
+    if numpy is not None:
+        return first + second
+    return [a + b for a, b in zip(first, second)]
+
+#Unigram, bigram and trigram counts of a contiguous piece of text. 'head' and 'tail' are the first and last (up to)
+#...two letter indices, which are needed to count the n-grams spanning the boundary when merging.
+class NgramCounts:
+
+    def __init__(self):
+        self.unigrams = emptyCounts(26)
+        self.bigrams = emptyCounts(26 ** 2)
+        self.trigrams = emptyCounts(26 ** 3)
+        self.letterCount = 0
+        self.head = []
+        self.tail = []
+
+    #Counts an array (or list) of letter indices.
+    @classmethod
+    def fromIndices(cls, indices):
+        counts = cls()
+        length = len(indices)
+
+        if numpy is not None:
+            counts.unigrams = bincount(indices, 26)
+            counts.bigrams = bincount(indices[:-1] * 26 + indices[1:], 26 ** 2) if length >= 2 else emptyCounts(26 ** 2)
+            counts.trigrams = bincount((indices[:-2] * 26 + indices[1:-1]) * 26 + indices[2:], 26 ** 3) if length >= 3 else emptyCounts(26 ** 3)
+        else:
+            counts.unigrams = bincount(indices, 26)
+            counts.bigrams = bincount([indices[i] * 26 + indices[i + 1] for i in range(length - 1)], 26 ** 2)
+            counts.trigrams = bincount([(indices[i] * 26 + indices[i + 1]) * 26 + indices[i + 2] for i in range(length - 2)], 26 ** 3)
+
+        counts.letterCount = length
+        counts.head = [int(index) for index in indices[:2]]
+        counts.tail = [int(index) for index in indices[max(0, length - 2):]]
+
+        return counts
+
+    #Counts bytes or a string.
+    @classmethod
+    def fromText(cls, data):
+        return cls.fromIndices(toIndices(data))
+
+    #Adds the counts of another part into this one. If 'contiguous' is True the other part is taken to follow this
+    #...one directly, and the bigrams and trigrams spanning the boundary are counted too. Otherwise the parts are
+    #...treated as separate texts. Returns self.
+    def merge(self, other, contiguous=True):
+        self.unigrams = addCounts(self.unigrams, other.unigrams)
+        self.bigrams = addCounts(self.bigrams, other.bigrams)
+        self.trigrams = addCounts(self.trigrams, other.trigrams)
+
+        if contiguous:
+            boundary = self.tail + other.head
+            split = len(self.tail)
+
+            #Only count the n-grams which contain letters from both sides.
+            for start in range(max(0, split - 1), min(split, len(boundary) - 1)):
+                self.bigrams[boundary[start] * 26 + boundary[start + 1]] += 1
+            for start in range(max(0, split - 2), min(split, len(boundary) - 2)):
+                self.trigrams[(boundary[start] * 26 + boundary[start + 1]) * 26 + boundary[start + 2]] += 1
+
+            self.head = (self.head + other.head)[:2]
+            self.tail = (self.tail + other.tail)[-2:]
+
+        self.letterCount += other.letterCount
+
+        return self
+
+    #Counts another chunk following the text counted so far.
+    def update(self, data):
+        return self.merge(NgramCounts.fromText(data))
+
+    #Returns the counts normalized to frequency vectors (each summing to 1, or all zeros if there is nothing counted).
+    #...Bigrams and trigrams are returned flat, indexed by a * 26 + b and (a * 26 + b) * 26 + c.
+    def frequencies(self):
+        return {"unigrams": normalize(self.unigrams), "bigrams": normalize(self.bigrams), "trigrams": normalize(self.trigrams)}
+
+def normalize(counts):
+    total = sum(counts) if numpy is None else int(counts.sum())
+
+    if numpy is not None:
+        return counts / total if total > 0 else numpy.zeros(len(counts))
+    return [count / total if total > 0 else 0.0 for count in counts]
+
+#Counts a file object (opened in binary mode, such as sys.stdin.buffer) one chunk at a time.
+def countStream(stream, size=None):
+    counts = NgramCounts()
+    size = size or chunkSize
+
+    while True:
+        chunk = stream.read(size)
+        if len(chunk) == 0:
+            break
+        counts.update(chunk)
+
+    return counts
+
+#Counts the bytes from 'start' to 'end' of a file, memory mapping it and counting one chunk at a time.
+def countFileRange(path, start=0, end=None):
+    counts = NgramCounts()
+
+    with open(path, "rb") as inputFile:
+        fileSize = os.fstat(inputFile.fileno()).st_size
+        end = fileSize if end is None else min(end, fileSize)
+
+        if start >= end:
+            return counts
+
+        with mmap.mmap(inputFile.fileno(), 0, access=mmap.ACCESS_READ) as fileMap:
+            for chunkStart in range(start, end, chunkSize):
+                counts.update(fileMap[chunkStart:min(chunkStart + chunkSize, end)])
+
+    return counts
+
+def countFile(path):
+    return countFileRange(path)
+
+#Counts a file by splitting it into byte ranges counted across 'jobs' processes, then merging the parts in order. The
+#...result is identical to countFile.
+def countFileParallel(path, jobs=None):
+    jobs = jobs or os.cpu_count() or 1
+    fileSize = os.path.getsize(path)
+    rangeSize = max(chunkSize, -(-fileSize // jobs))
+    ranges = [(start, min(start + rangeSize, fileSize)) for start in range(0, fileSize, rangeSize)]
+
+    counts = NgramCounts()
+
+    if jobs <= 1 or len(ranges) <= 1:
+        parts = [countFileRange(path, start, end) for start, end in ranges]
+    else:
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            parts = list(executor.map(countFileRange, [path] * len(ranges), [start for start, _ in ranges], [end for _, end in ranges]))
+
+    for part in parts:
+        counts.merge(part)
+
+    return counts
+
+#Counts many separate files across 'jobs' processes, merging them as separate texts.
+def countFiles(paths, jobs=None):
+    jobs = jobs or os.cpu_count() or 1
+    counts = NgramCounts()
+
+    if jobs <= 1 or len(paths) <= 1:
+        parts = [countFile(path) for path in paths]
+    else:
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            parts = list(executor.map(countFile, paths))
+
+    for part in parts:
+        counts.merge(part, contiguous=False)
+
+    return counts
+
+#Chi-squared statistic of the unigram counts against the expected letter frequencies (English by default). Lower means
+#...closer to the expected distribution.
+def chiSquared(unigrams, expected=englishFrequencies):
+    total = sum(int(count) for count in unigrams)
+    if total == 0:
+        return 0.0
+    return sum((int(count) - total * frequency) ** 2 / (total * frequency) for count, frequency in zip(unigrams, expected))
+
+#Index of coincidence of the unigram counts: the probability that two letters picked at random are the same. English
+#...text is around 0.066, while uniformly random letters are around 0.038.
+def indexOfCoincidence(unigrams):
+    total = sum(int(count) for count in unigrams)
+    if total < 2:
+        return 0.0
+    return sum(int(count) * (int(count) - 1) for count in unigrams) / (total * (total - 1))
+
+#Prints the letter frequencies, chi-squared statistic and index of coincidence of the files given on the command line,
+#...or of standard input.
+def main():
+    if len(sys.argv) > 1:
+        counts = countFiles(sys.argv[1:])
+    else:
+        counts = countStream(sys.stdin.buffer)
+
+    unigramFrequencies = counts.frequencies()["unigrams"]
+
+    print("Letters counted: " + str(counts.letterCount))
+    for letter, frequency in sorted(zip(alphabet, unigramFrequencies), key=lambda pair: -pair[1]):
+        print("%s: %.4f" % (letter, frequency))
+    print("Chi-squared against English: %.2f" % chiSquared(counts.unigrams))
+    print("Index of coincidence: %.4f" % indexOfCoincidence(counts.unigrams))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,225 @@
+import math
+import os
+import random
+import sys
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+from project01Decryptor import alphabet, isValidKey, decryptTextTable
+
+#Automatic key search for the substitution cipher in project01Decryptor. The search starts from the key given by
+#...matching the ciphertext letter frequencies against English letter frequencies, then hill climbs (with simulated
+#...annealing) over swaps of two letters in the key, scored by the quadgram log probability of the decrypted text.
+#...Independent random restarts are run across a process pool and the best key is kept.
+
+#English letters from most to least frequent.
+englishFrequencyOrder = "etaoinshrdlcumwfgypbvkjxqz"
+
+#Quadgram counts shipped with the solver and loaded when no other quadgram file has been loaded with loadQuadgrams.
+#...They were counted from about a million letters of public domain English text (mostly Newton's Opticks).
+defaultQuadgramPath = os.path.join(os.path.dirname(os.path.abspath(__file__)), "english_quadgrams.txt")
+
+#Log10 probability given to quadgrams which were never seen.
+quadgramFloorWeight = 0.01
+
+#Quadgram log probabilities indexed by a * 26^3 + b * 26^2 + c * 26 + d for the letter indices a, b, c, d.
+quadgramScores = None
+
+#The quadgram file loaded with loadQuadgrams, so worker processes can load the same file.
+quadgramPath = None
+
+#Converts text to a list of letter indices, dropping anything which is not a letter of the alphabet.
+def textToIndices(text):
+    return [alphabet.index(letter) for letter in text.lower() if letter in alphabet]
+
+#Builds the quadgram log probability table from quadgram counts.
+def buildQuadgramScores(counts):
+    total = sum(counts.values())
+    floor = math.log10(quadgramFloorWeight / total)
+    scores = [floor] * (26 ** 4)
+
+    for quadgram, count in counts.items():
+        a, b, c, d = (alphabet.index(letter) for letter in quadgram)
+        scores[((a * 26 + b) * 26 + c) * 26 + d] = math.log10(count / total)
+
+    return scores
+
+#Loads quadgram counts from a file with one "QUADGRAM COUNT" pair per line (the common format of English quadgram
+#...statistics files) and uses them for scoring.
+def loadQuadgrams(path):
+    global quadgramScores, quadgramPath
+
+    counts = Counter()
+    with open(path) as quadgramFile:
+        for line in quadgramFile:
+            parts = line.split()
+            if len(parts) == 2 and len(parts[0]) == 4 and parts[0].isalpha():
+                counts[parts[0].lower()] += int(parts[1])
+
+    quadgramScores = buildQuadgramScores(counts)
+    quadgramPath = path
+
+#Runs in every worker process before any restarts, loading the same quadgram file as the parent process.
+def initializeWorker(path):
+    if path is not None:
+        loadQuadgrams(path)
+
+#Returns the quadgram scores, loading the default quadgram file if no file has been loaded yet.
+def getQuadgramScores():
+    if quadgramScores is None:
+        loadQuadgrams(defaultQuadgramPath)
+
+    return quadgramScores
+
+#Scores English-looking text. Higher (closer to zero) is better.
+def scoreText(text):
+    scores = getQuadgramScores()
+    indices = textToIndices(text)
+    return sum(scores[((indices[i] * 26 + indices[i + 1]) * 26 + indices[i + 2]) * 26 + indices[i + 3]] for i in range(len(indices) - 3))
+
+#Converts a mapping from cipher letter index to plain letter index into a key in the format used by decryptText, where
+#...key[i] is the cipher letter for alphabet[i].
+def mappingToKey(mapping):
+    key = [""] * 26
+    for cipherIndex, plainIndex in enumerate(mapping):
+        key[plainIndex] = alphabet[cipherIndex]
+    return "".join(key)
+
+def keyToMapping(key):
+    mapping = [0] * 26
+    for plainIndex, cipherLetter in enumerate(key):
+        mapping[alphabet.index(cipherLetter)] = plainIndex
+    return mapping
+
+#Builds the starting mapping by matching the ciphertext letters, from most to least frequent, with English letters
+#...from most to least frequent.
+def getFrequencyMapping(cipherIndices):
+    counts = Counter(cipherIndices)
+    cipherOrder = sorted(range(26), key=lambda i: (-counts[i], i))
+
+    mapping = [0] * 26
+    for rank, cipherIndex in enumerate(cipherOrder):
+        mapping[cipherIndex] = alphabet.index(englishFrequencyOrder[rank])
+    return mapping
+
+#Runs one hill climb from the given mapping. The decrypted text is kept as a list of plain letter indices, and a swap
+#...of two cipher letters only rescores the quadgrams overlapping a position holding one of those two letters, so the
+#...cost of a swap depends on how often the two letters appear rather than on the length of the text. Worse swaps are
+#...accepted with the simulated annealing probability while the temperature is above zero.
+def climb(cipherIndices, mapping, iterations, temperature, generator):
+    scores = getQuadgramScores()
+    quadgramCount = len(cipherIndices) - 3
+
+    mapping = list(mapping)
+    plain = [mapping[c] for c in cipherIndices]
+
+    #For every cipher letter, the positions holding it and the start of every quadgram which contains it.
+    positions = [[] for _ in range(26)]
+    for position, c in enumerate(cipherIndices):
+        positions[c].append(position)
+    affectedStarts = [{s for position in letterPositions for s in range(max(0, position - 3), min(quadgramCount, position + 1))} for letterPositions in positions]
+
+    def scoreStarts(starts):
+        return sum(scores[((plain[s] * 26 + plain[s + 1]) * 26 + plain[s + 2]) * 26 + plain[s + 3]] for s in starts)
+
+    def applyMapping(a, b):
+        plainA, plainB = mapping[a], mapping[b]
+        for position in positions[a]:
+            plain[position] = plainA
+        for position in positions[b]:
+            plain[position] = plainB
+
+    score = scoreStarts(range(max(0, quadgramCount)))
+    bestScore, bestMapping = score, list(mapping)
+
+    #Swapping two letters which never appear does not change the text, so every swap takes one letter which appears and
+    #...any other letter. Letters which do not appear still have to be swapped in, as they hold the plain letters (such
+    #...as q or x) which the text may need.
+    letters = [c for c in range(26) if len(positions[c]) > 0]
+    if quadgramCount <= 0 or len(letters) == 0:
+        return bestScore, bestMapping
+
+    for iteration in range(iterations):
+        a = generator.choice(letters)
+        b = generator.randrange(25)
+        if b >= a:
+            b += 1
+        starts = affectedStarts[a] | affectedStarts[b]
+
+        oldScore = scoreStarts(starts)
+        mapping[a], mapping[b] = mapping[b], mapping[a]
+        applyMapping(a, b)
+        delta = scoreStarts(starts) - oldScore
+
+        currentTemperature = temperature * (1 - iteration / iterations)
+
+        if delta >= 0 or (currentTemperature > 0 and generator.random() < math.exp(delta / currentTemperature)):
+            score += delta
+            if score > bestScore:
+                bestScore, bestMapping = score, list(mapping)
+        else:
+            mapping[a], mapping[b] = mapping[b], mapping[a]
+            applyMapping(a, b)
+
+    return bestScore, bestMapping
+
+#Runs a single restart. The first restart starts from the frequency mapping, and every other restart starts from it
+#...with some random swaps, so the restarts explore different parts of the key space. This is run in worker processes,
+#...so it takes everything it needs as arguments.
+def runRestart(cipherIndices, restart, iterations, temperature, seed):
+    generator = random.Random(None if seed is None else seed * 1000003 + restart)
+    mapping = getFrequencyMapping(cipherIndices)
+
+    if restart > 0:
+        for _ in range(restart % 10 + 3):
+            a, b = generator.sample(range(26), 2)
+            mapping[a], mapping[b] = mapping[b], mapping[a]
+
+    return climb(cipherIndices, mapping, iterations, temperature, generator)
+
+#Searches for the key of a substitution ciphertext without any input from the operator. Returns the best key found (in
+#...the format used by decryptText), its score, and the decrypted text. Restarts are spread across 'jobs' processes.
+def solveKey(cipherText, restarts=8, iterations=20000, temperature=2.0, jobs=None, seed=None):
+    cipherIndices = textToIndices(cipherText)
+
+    if jobs is None:
+        jobs = os.cpu_count() or 1
+
+    #Load the quadgram file here, so a missing file is reported once and the workers load the same file.
+    getQuadgramScores()
+
+    argumentList = [(cipherIndices, restart, iterations, temperature, seed) for restart in range(restarts)]
+
+    if jobs <= 1 or restarts <= 1:
+        results = [runRestart(*arguments) for arguments in argumentList]
+    else:
+        with ProcessPoolExecutor(max_workers=jobs, initializer=initializeWorker, initargs=(quadgramPath,)) as executor:
+            results = list(executor.map(runRestart, *zip(*argumentList)))
+
+    bestScore, bestMapping = max(results, key=lambda result: result[0])
+    key = mappingToKey(bestMapping)
+
+    return key, bestScore, decryptTextTable(key, cipherText.lower())
+
+#Solves every ciphertext given on the command line (as files, one ciphertext per file) or on standard input (one
+#...ciphertext per line).
+def main():
+    if len(sys.argv) > 1:
+        cipherTexts = []
+        for path in sys.argv[1:]:
+            with open(path) as cipherFile:
+                cipherTexts.append(cipherFile.read())
+    else:
+        cipherTexts = [line for line in sys.stdin.read().splitlines() if line.strip() != ""]
+
+    for cipherText in cipherTexts:
+        key, score, message = solveKey(cipherText)
+
+        print("Key: " + key + (" (valid)" if isValidKey(key) else ""))
+        print("Score: %.2f" % score)
+        print("The decrypted message is: " + message)
+        print()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,10 @@
 
+#NumPy is optional, and is only needed for the bit-sliced engine (BitslicedA51).
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
 regX = []
 regY = []
 regZ = []
@@ -72,6 +78,377 @@ def getKeyStream():
 
 
 
+#Tap positions of each register. Bit i of a register is the element at index i of regX/regY/regZ, so the last
+#...index is both the clocking bit and the output bit.
+tapsX = (13, 16, 17, 18)
+tapsY = (20, 21)
+tapsZ = (7, 20, 21, 22)
+
+def getTapMask(taps):
+    mask = 0
+    for tap in taps:
+        mask |= 1 << tap
+    return mask
+
+if hasattr(int, "bit_count"):
+    def getParity(value):
+        return value.bit_count() & 1
+else:
+    def getParity(value):
+        return bin(value).count("1") & 1
+
+#A5/1 cipher holding each register as an integer instead of a list, with bit i of the integer being element i of the
+#...matching list. Stepping a register shifts it left by one and puts the feedback bit in bit 0, which is the same as
+#...pop() followed by insert(0, t). Each instance has its own state, so multiple instances can be used at once.
+class A51:
+
+    maskX = (1 << lenX) - 1
+    maskY = (1 << lenY) - 1
+    maskZ = (1 << lenZ) - 1
+
+    tapMaskX = getTapMask(tapsX)
+    tapMaskY = getTapMask(tapsY)
+    tapMaskZ = getTapMask(tapsZ)
+
+    #The key is a string (or list) of lenX + lenY + lenZ bits, loaded the same way as fillRegisters.
+    def __init__(self, key):
+        if len(key) != lenX + lenY + lenZ:
+            raise ValueError("Key must have " + str(lenX + lenY + lenZ) + " bits, got " + str(len(key)))
+
+        self.x = A51.bitsToRegister(key[:lenX])
+        self.y = A51.bitsToRegister(key[lenX:lenX + lenY])
+        self.z = A51.bitsToRegister(key[lenX + lenY:])
+
+    @staticmethod
+    def bitsToRegister(bits):
+        register = 0
+        for i in range(len(bits)):
+            if int(bits[i]) not in (0, 1):
+                raise ValueError("Key bits must be 0 or 1, got " + repr(bits[i]))
+            register |= int(bits[i]) << i
+        return register
+
+    @staticmethod
+    def registerToBits(register, length):
+        return [(register >> i) & 1 for i in range(length)]
+
+    #Creates a cipher directly from register integers.
+    @classmethod
+    def fromState(cls, x, y, z):
+        cipher = cls.__new__(cls)
+        cipher.x = x & cls.maskX
+        cipher.y = y & cls.maskY
+        cipher.z = z & cls.maskZ
+        return cipher
+
+    def getState(self):
+        return (self.x, self.y, self.z)
+
+    #Returns the registers as lists of bits, in the same layout as regX, regY and regZ.
+    def getRegisters(self):
+        return (A51.registerToBits(self.x, lenX), A51.registerToBits(self.y, lenY), A51.registerToBits(self.z, lenZ))
+
+    #Clocks the registers once using majority clocking, and returns the keystream bit. Same as one iteration of
+    #...getKeyStream.
+    def step(self):
+        x, y, z = self.x, self.y, self.z
+
+        clockX = x >> (lenX - 1)
+        clockY = y >> (lenY - 1)
+        clockZ = z >> (lenZ - 1)
+        majority = 1 if clockX + clockY + clockZ > 1 else 0
+
+        if clockX == majority:
+            x = ((x << 1) & A51.maskX) | getParity(x & A51.tapMaskX)
+        if clockY == majority:
+            y = ((y << 1) & A51.maskY) | getParity(y & A51.tapMaskY)
+        if clockZ == majority:
+            z = ((z << 1) & A51.maskZ) | getParity(z & A51.tapMaskZ)
+
+        self.x, self.y, self.z = x, y, z
+
+        return (x >> (lenX - 1)) ^ (y >> (lenY - 1)) ^ (z >> (lenZ - 1))
+
+    #Generates bitCount keystream bits as a list.
+    def getKeyStream(self, bitCount=32):
+        return [self.step() for _ in range(bitCount)]
+
+    #Generates byteCount bytes of keystream into a bytearray, with the first keystream bit in the most significant bit
+    #...of each byte. The registers are kept in local variables while generating, as this is the hot loop.
+    def getKeyStreamBytes(self, byteCount):
+        output = bytearray(byteCount)
+
+        x, y, z = self.x, self.y, self.z
+        maskX, maskY, maskZ = A51.maskX, A51.maskY, A51.maskZ
+        tapMaskX, tapMaskY, tapMaskZ = A51.tapMaskX, A51.tapMaskY, A51.tapMaskZ
+        shiftX, shiftY, shiftZ = lenX - 1, lenY - 1, lenZ - 1
+        parity = getParity
+
+        for i in range(byteCount):
+            byte = 0
+
+            for _ in range(8):
+                clockX = x >> shiftX
+                clockY = y >> shiftY
+                clockZ = z >> shiftZ
+                majority = 1 if clockX + clockY + clockZ > 1 else 0
+
+                if clockX == majority:
+                    x = ((x << 1) & maskX) | parity(x & tapMaskX)
+                if clockY == majority:
+                    y = ((y << 1) & maskY) | parity(y & tapMaskY)
+                if clockZ == majority:
+                    z = ((z << 1) & maskZ) | parity(z & tapMaskZ)
+
+                byte = (byte << 1) | ((x >> shiftX) ^ (y >> shiftY) ^ (z >> shiftZ))
+
+            output[i] = byte
+
+        self.x, self.y, self.z = x, y, z
+
+        return output
+
+    #XORs the data with the next len(data) bytes of keystream.
+    def encrypt(self, data):
+        keyStream = self.getKeyStreamBytes(len(data))
+        return (int.from_bytes(data, "big") ^ int.from_bytes(keyStream, "big")).to_bytes(len(data), "big")
+
+    #Decryption is the same operation as encryption.
+    def decrypt(self, data):
+        return self.encrypt(data)
+
+
+#Number of keystream bits emitted per clocking table lookup in TableA51. The clocking and output bits for this many
+#...steps only depend on the top tableSteps + 1 bits of each register, so the table has 2^(3 * (tableSteps + 1))
+#...entries.
+tableSteps = 4
+
+#Lazily built tables used by TableA51, shared by every instance.
+clockingTable = None
+advanceTables = None
+
+#Builds the clocking table. Each entry is indexed by the top tableSteps + 1 bits of X, Y and Z, and holds the
+#...tableSteps keystream bits (first bit most significant) and the number of times each register steps. After a
+#...register has stepped s times its top bit is the original bit at len - 1 - s, so the clocking and output bits can
+#...be read straight from the windows without knowing the feedback bits.
+def buildClockingTable():
+    windowSize = tableSteps + 1
+    windowMask = (1 << windowSize) - 1
+    table = []
+
+    for index in range(1 << (3 * windowSize)):
+        windows = ((index >> (2 * windowSize)) & windowMask, (index >> windowSize) & windowMask, index & windowMask)
+        steps = [0, 0, 0]
+        bits = 0
+
+        for _ in range(tableSteps):
+            clocks = [(windows[r] >> (windowSize - 1 - steps[r])) & 1 for r in range(3)]
+            majority = 1 if sum(clocks) > 1 else 0
+
+            for r in range(3):
+                if clocks[r] == majority:
+                    steps[r] += 1
+
+            bit = 0
+            for r in range(3):
+                bit ^= (windows[r] >> (windowSize - 1 - steps[r])) & 1
+            bits = (bits << 1) | bit
+
+        table.append((bits, steps[0], steps[1], steps[2]))
+
+    return table
+
+#Builds the tables advancing a register by 0 to tableSteps steps at once. Within that many steps every tap still
+#...reads an original register bit, so the k feedback bits are a linear function of the register. A linear function
+#...can be split across the bytes of the register and xored back together, so each step count k has one table of 256
+#...entries per register byte holding the feedback bits that byte contributes.
+def buildAdvanceTables(length, tapMask):
+    byteCount = (length + 7) // 8
+    tables = []
+
+    for k in range(tableSteps + 1):
+        byteTables = []
+
+        for byteIndex in range(byteCount):
+            byteTable = []
+
+            for byte in range(256):
+                register = (byte << (8 * byteIndex)) & ((1 << length) - 1)
+                feedback = 0
+
+                for i in range(k):
+                    feedback = (feedback << 1) | getParity(register & (tapMask >> i))
+
+                byteTable.append(feedback)
+
+            byteTables.append(tuple(byteTable))
+
+        tables.append(tuple(byteTables))
+
+    return tuple(tables)
+
+def getTables():
+    global clockingTable, advanceTables
+
+    #Each keystream byte is built from whole lookups, so the lookups must fill a byte exactly.
+    if tableSteps < 1 or 8 % tableSteps != 0:
+        raise ValueError("tableSteps must divide 8, got " + str(tableSteps))
+
+    if clockingTable is None:
+        clockingTable = buildClockingTable()
+        advanceTables = (buildAdvanceTables(lenX, A51.tapMaskX), buildAdvanceTables(lenY, A51.tapMaskY), buildAdvanceTables(lenZ, A51.tapMaskZ))
+
+    return clockingTable, advanceTables
+
+#A51 generating keystream with table lookups instead of stepping one bit at a time. Each lookup in the clocking table
+#...emits tableSteps keystream bits and gives the number of steps for each register, which are then advanced that many
+#...steps at once using the advance tables. Produces the same keystream as A51.
+class TableA51(A51):
+
+    def getKeyStreamBytes(self, byteCount):
+        table, (tablesX, tablesY, tablesZ) = getTables()
+        output = bytearray(byteCount)
+
+        x, y, z = self.x, self.y, self.z
+        maskX, maskY, maskZ = A51.maskX, A51.maskY, A51.maskZ
+        windowSize = tableSteps + 1
+        shiftX, shiftY, shiftZ = lenX - windowSize, lenY - windowSize, lenZ - windowSize
+        lookupsPerByte = 8 // tableSteps
+
+        for i in range(byteCount):
+            byte = 0
+
+            for _ in range(lookupsPerByte):
+                bits, stepsX, stepsY, stepsZ = table[((x >> shiftX) << (2 * windowSize)) | ((y >> shiftY) << windowSize) | (z >> shiftZ)]
+                byte = (byte << tableSteps) | bits
+
+                x0, x1, x2 = tablesX[stepsX]
+                x = ((x << stepsX) & maskX) | (x0[x & 255] ^ x1[(x >> 8) & 255] ^ x2[x >> 16])
+                y0, y1, y2 = tablesY[stepsY]
+                y = ((y << stepsY) & maskY) | (y0[y & 255] ^ y1[(y >> 8) & 255] ^ y2[y >> 16])
+                z0, z1, z2 = tablesZ[stepsZ]
+                z = ((z << stepsZ) & maskZ) | (z0[z & 255] ^ z1[(z >> 8) & 255] ^ z2[z >> 16])
+
+            output[i] = byte
+
+        self.x, self.y, self.z = x, y, z
+
+        return output
+
+#Compares the speed of the bit-serial A51 and the table-driven TableA51 keystream generation.
+def benchmarkTableKeyStream(byteCount=100000):
+    import time
+
+    key = "1010101010101010101110011001100110011001111100001111000011110000"
+
+    start = time.perf_counter()
+    getTables()
+    tableBuildTime = time.perf_counter() - start
+
+    start = time.perf_counter()
+    serialKeyStream = A51(key).getKeyStreamBytes(byteCount)
+    serialTime = time.perf_counter() - start
+
+    start = time.perf_counter()
+    tableKeyStream = TableA51(key).getKeyStreamBytes(byteCount)
+    tableTime = time.perf_counter() - start
+
+    print("Table build time: %.3fs" % tableBuildTime)
+    print("Bit-serial: %.3fs (%.0f bytes/s)" % (serialTime, byteCount / serialTime))
+    print("Table-driven: %.3fs (%.0f bytes/s)" % (tableTime, byteCount / tableTime))
+    print("Keystreams match:", serialKeyStream == tableKeyStream)
+
+    return serialTime, tableTime
+
+#Bit-sliced A5/1 running many keys at once. Instead of one integer per register, every register bit is a NumPy array
+#...of uint64 lanes, where bit j of lane l holds that register bit for key 64 * l + j. Each step is then a handful of
+#...bitwise operations over the lanes, advancing every key at once. Majority clocking has no branches: the majority is
+#...the bitwise majority function of the three clocking bits, and a register is only stepped in the key positions where
+#...its clocking bit equals the majority.
+class BitslicedA51:
+
+    #Keys are a list of key strings (or lists) of lenX + lenY + lenZ bits each, or a NumPy array of shape
+    #...(keyCount, lenX + lenY + lenZ) holding 0's and 1's.
+    def __init__(self, keys):
+        if numpy is None:
+            raise ImportError("NumPy is required for BitslicedA51")
+
+        keyBits = numpy.array([[int(bit) for bit in key] for key in keys] if not isinstance(keys, numpy.ndarray) else keys, dtype=numpy.uint8).reshape(len(keys), -1)
+
+        if keyBits.shape[1] != lenX + lenY + lenZ:
+            raise ValueError("Keys must have " + str(lenX + lenY + lenZ) + " bits, got " + str(keyBits.shape[1]))
+
+        if numpy.any(keyBits > 1):
+            raise ValueError("Key bits must be 0 or 1")
+
+        self.keyCount = len(keyBits)
+        self.laneCount = (self.keyCount + 63) // 64
+
+        #Pad the keys to a whole number of lanes, then pack each key bit position into uint64 lanes.
+        paddedBits = numpy.zeros((self.laneCount * 64, lenX + lenY + lenZ), dtype=numpy.uint8)
+        paddedBits[:self.keyCount] = keyBits
+        lanes = numpy.packbits(paddedBits.T.reshape(lenX + lenY + lenZ, self.laneCount, 64), axis=2, bitorder="little")
+        lanes = numpy.ascontiguousarray(lanes).view("<u8").reshape(lenX + lenY + lenZ, self.laneCount).astype(numpy.uint64)
+
+        self.x = lanes[:lenX].copy()
+        self.y = lanes[lenX:lenX + lenY].copy()
+        self.z = lanes[lenX + lenY:].copy()
+
+    #Steps a register in the key positions set in stepMask. The feedback bit is the xor of the tap rows.
+    @staticmethod
+    def stepRegister(register, taps, stepMask):
+        feedback = register[taps[0]].copy()
+        for tap in taps[1:]:
+            feedback ^= register[tap]
+
+        keepMask = ~stepMask
+        shifted = numpy.empty_like(register)
+        shifted[1:] = register[:-1]
+        shifted[0] = feedback
+
+        return (shifted & stepMask) | (register & keepMask)
+
+    #Clocks every key once, returning the keystream bit of every key packed into lanes.
+    def step(self):
+        clockX = self.x[lenX - 1]
+        clockY = self.y[lenY - 1]
+        clockZ = self.z[lenZ - 1]
+        majority = (clockX & clockY) | (clockX & clockZ) | (clockY & clockZ)
+
+        self.x = BitslicedA51.stepRegister(self.x, tapsX, ~(clockX ^ majority))
+        self.y = BitslicedA51.stepRegister(self.y, tapsY, ~(clockY ^ majority))
+        self.z = BitslicedA51.stepRegister(self.z, tapsZ, ~(clockZ ^ majority))
+
+        return self.x[lenX - 1] ^ self.y[lenY - 1] ^ self.z[lenZ - 1]
+
+    #Generates bitCount keystream bits for every key, returning a uint8 matrix with one row per key.
+    def getKeyStreams(self, bitCount=32):
+        laneBits = numpy.empty((bitCount, self.laneCount), dtype="<u8")
+        for i in range(bitCount):
+            laneBits[i] = self.step()
+
+        #Unpack the lanes back into one column per key, then transpose to one row per key.
+        keyBits = numpy.unpackbits(laneBits.view(numpy.uint8).reshape(bitCount, self.laneCount * 8), axis=1, bitorder="little")
+
+        return numpy.ascontiguousarray(keyBits[:, :self.keyCount].T)
+
+#Generates bitCount keystream bits for every key using the bit-sliced engine, returning a matrix with one row per key.
+def getBitslicedKeyStreams(keys, bitCount=32):
+    return BitslicedA51(keys).getKeyStreams(bitCount)
+
+#Checks the bit-sliced engine against the scalar A51 class on random keys.
+def testBitslicedKeyStreams(keyCount=200, bitCount=64):
+    import random
+
+    keys = ["".join(random.choice("01") for _ in range(lenX + lenY + lenZ)) for _ in range(keyCount)]
+    keyStreams = getBitslicedKeyStreams(keys, bitCount)
+
+    matches = all(list(keyStreams[i]) == A51(keys[i]).getKeyStream(bitCount) for i in range(keyCount))
+    print("Bit-sliced keystreams match the scalar keystreams:", matches)
+
+    return matches
+
+
 def main():
     key = "1010101010101010101110011001100110011001111100001111000011110000"
 
@@ -79,4 +456,5 @@ def main():
     getKeyStream()
 
 
-main()
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,288 @@
+import bisect
+import json
+import mmap
+import os
+import random
+
+from project02A51 import lenX, lenY, lenZ, tapsX, tapsY, tapsZ, getParity, getTapMask
+
+#Time-memory tradeoff state recovery for A5/1. A table mapping register states to the keystream prefix they produce is
+#...precomputed and stored as a sorted file of fixed-size records, which is memory mapped and binary searched to find
+#...every state producing a known keystream window. A found state can then be rolled back to the state right after
+#...the key was loaded (fillRegisters).
+
+tableMagic = b"A51T"
+
+#Register lengths and tap positions of an A5/1 variant, using the same layout as project02A51: bit i of a register is
+#...element i of its list, and the last bit is both the clocking bit and the output bit. Reduced-size variants make
+#...tables covering the whole state space practical to build on one machine.
+class A51Parameters:
+
+    def __init__(self, lengths, taps):
+        if len(lengths) != 3 or len(taps) != 3:
+            raise ValueError("A5/1 has exactly three registers")
+
+        for length, registerTaps in zip(lengths, taps):
+            #Rolling back a step relies on the bit shifted out of the register being one of the taps.
+            if length - 1 not in registerTaps or any(tap < 0 or tap >= length for tap in registerTaps):
+                raise ValueError("Taps must be within the register and include the last bit, got " + str(registerTaps) + " for length " + str(length))
+
+        self.lengths = tuple(lengths)
+        self.taps = tuple(tuple(registerTaps) for registerTaps in taps)
+        self.masks = tuple((1 << length) - 1 for length in lengths)
+        self.tapMasks = tuple(getTapMask(registerTaps) for registerTaps in taps)
+        self.stateBits = sum(lengths)
+
+    def toDict(self):
+        return {"lengths": list(self.lengths), "taps": [list(registerTaps) for registerTaps in self.taps]}
+
+    @classmethod
+    def fromDict(cls, values):
+        return cls(values["lengths"], values["taps"])
+
+    def __eq__(self, other):
+        return isinstance(other, A51Parameters) and self.lengths == other.lengths and self.taps == other.taps
+
+    #Packs a (x, y, z) state into a single integer, with x in the lowest bits.
+    def packState(self, state):
+        return state[0] | (state[1] << self.lengths[0]) | (state[2] << (self.lengths[0] + self.lengths[1]))
+
+    def unpackState(self, packed):
+        return (packed & self.masks[0], (packed >> self.lengths[0]) & self.masks[1], (packed >> (self.lengths[0] + self.lengths[1])) & self.masks[2])
+
+    #Clocks a state once using majority clocking, returning the new state and the keystream bit. Same as A51.step for
+    #...the full-size parameters.
+    def step(self, state):
+        newState = list(state)
+        clocks = [(state[r] >> (self.lengths[r] - 1)) & 1 for r in range(3)]
+        majority = 1 if sum(clocks) > 1 else 0
+
+        for r in range(3):
+            if clocks[r] == majority:
+                newState[r] = ((state[r] << 1) & self.masks[r]) | getParity(state[r] & self.tapMasks[r])
+
+        bit = 0
+        for r in range(3):
+            bit ^= (newState[r] >> (self.lengths[r] - 1)) & 1
+
+        return tuple(newState), bit
+
+    def getKeyStream(self, state, bitCount):
+        keyStream = []
+        for _ in range(bitCount):
+            state, bit = self.step(state)
+            keyStream.append(bit)
+        return keyStream
+
+    #Undoes one step of a single register. The bit shifted out is the top tap, so it is the only bit which makes the
+    #...feedback bit (now bit 0) come out right.
+    def unstepRegister(self, r, register):
+        shifted = register >> 1
+        lostBit = (register & 1) ^ getParity(shifted & self.tapMasks[r] & ~(1 << (self.lengths[r] - 1)))
+        return shifted | (lostBit << (self.lengths[r] - 1))
+
+    #Returns every state which steps to the given state. Majority clocking steps either all three registers or
+    #...exactly two of them, so each of those four patterns is undone and kept if stepping it forward again gives the
+    #...same state. There can be none, one, or several predecessors.
+    def getPredecessors(self, state):
+        predecessors = set()
+
+        for pattern in ((1, 1, 1), (1, 1, 0), (1, 0, 1), (0, 1, 1)):
+            previous = tuple(self.unstepRegister(r, state[r]) if pattern[r] else state[r] for r in range(3))
+
+            if self.step(previous)[0] == state:
+                predecessors.add(previous)
+
+        return predecessors
+
+#The parameters of project02A51.
+fullSize = A51Parameters((lenX, lenY, lenZ), (tapsX, tapsY, tapsZ))
+
+#A reduced-size variant with an 18 bit state, small enough to tabulate completely.
+reducedSize = A51Parameters((5, 6, 7), ((2, 4), (4, 5), (1, 5, 6)))
+
+#Rolls a state back 'steps' steps, returning every possible state at that point. With steps equal to the number of
+#...keystream bits generated before the state, the result is the candidate states right after the key was loaded.
+def rollBack(state, steps, parameters=fullSize):
+    states = {tuple(state)}
+
+    for _ in range(steps):
+        previousStates = set()
+        for current in states:
+            previousStates |= parameters.getPredecessors(current)
+        states = previousStates
+
+        if len(states) == 0:
+            break
+
+    return states
+
+#Packs a list of keystream bits into an integer, first bit most significant.
+def bitsToInt(bits):
+    value = 0
+    for bit in bits:
+        value = (value << 1) | int(bit)
+    return value
+
+#Builds a table of 'tableSize' states and writes it to 'path'. Each record holds the prefixBits bit keystream prefix of
+#...a state followed by the packed state, as a big-endian integer of a fixed number of bytes, so sorting the records
+#...sorts them by prefix. If tableSize is None or covers the whole state space every state is included, otherwise
+#...states are sampled at random (the table budget). Returns the number of records written.
+def buildTable(path, prefixBits=32, tableSize=None, parameters=fullSize, seed=None):
+    stateSpace = 1 << parameters.stateBits
+
+    if tableSize is None or tableSize >= stateSpace:
+        packedStates = range(stateSpace)
+    else:
+        generator = random.Random(seed)
+        packedStates = {generator.getrandbits(parameters.stateBits) for _ in range(tableSize)}
+
+    records = []
+    for packedState in packedStates:
+        prefix = bitsToInt(parameters.getKeyStream(parameters.unpackState(packedState), prefixBits))
+        records.append((prefix << parameters.stateBits) | packedState)
+
+    records.sort()
+
+    recordBytes = (prefixBits + parameters.stateBits + 7) // 8
+    header = json.dumps({"parameters": parameters.toDict(), "prefixBits": prefixBits, "recordBytes": recordBytes, "recordCount": len(records)}).encode("utf-8")
+
+    with open(path, "wb") as tableFile:
+        tableFile.write(tableMagic)
+        tableFile.write(len(header).to_bytes(4, "big"))
+        tableFile.write(header)
+
+        for i in range(0, len(records), 65536):
+            tableFile.write(b"".join(record.to_bytes(recordBytes, "big") for record in records[i:i + 65536]))
+
+    return len(records)
+
+#A table written by buildTable, memory mapped so only the records touched by the binary search are read from disk.
+class StateTable:
+
+    def __init__(self, path):
+        self.file = open(path, "rb")
+
+        try:
+            if self.file.read(len(tableMagic)) != tableMagic:
+                raise ValueError("Not an A5/1 state table: " + str(path))
+
+            headerLength = int.from_bytes(self.file.read(4), "big")
+            header = json.loads(self.file.read(headerLength).decode("utf-8"))
+
+            self.parameters = A51Parameters.fromDict(header["parameters"])
+            self.prefixBits = header["prefixBits"]
+            self.recordBytes = header["recordBytes"]
+            self.recordCount = header["recordCount"]
+            self.dataOffset = len(tableMagic) + 4 + headerLength
+
+            if os.fstat(self.file.fileno()).st_size != self.dataOffset + self.recordCount * self.recordBytes:
+                raise ValueError("State table is truncated: " + str(path))
+
+            self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ) if self.recordCount > 0 else b""
+        except Exception:
+            self.file.close()
+            raise
+
+    def close(self):
+        if isinstance(self.map, mmap.mmap):
+            self.map.close()
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exceptionInfo):
+        self.close()
+
+    def __len__(self):
+        return self.recordCount
+
+    def getRecord(self, index):
+        start = self.dataOffset + index * self.recordBytes
+        return int.from_bytes(self.map[start:start + self.recordBytes], "big")
+
+    def getPrefix(self, index):
+        return self.getRecord(index) >> self.parameters.stateBits
+
+    #Returns every state in the table whose keystream starts with the given prefixBits bits.
+    def lookupPrefix(self, prefixBits):
+        if len(prefixBits) != self.prefixBits:
+            raise ValueError("Prefix must have " + str(self.prefixBits) + " bits, got " + str(len(prefixBits)))
+
+        prefix = bitsToInt(prefixBits)
+        prefixes = PrefixView(self)
+        first = bisect.bisect_left(prefixes, prefix)
+        last = bisect.bisect_right(prefixes, prefix, lo=first)
+
+        stateMask = (1 << self.parameters.stateBits) - 1
+        return [self.parameters.unpackState(self.getRecord(i) & stateMask) for i in range(first, last)]
+
+    #Finds the states producing a known keystream. Every window of prefixBits bits is looked up, and each state
+    #...found is checked against the rest of the keystream. Returns a list of (offset, state) pairs, where state is
+    #...the register state after 'offset' keystream bits were generated.
+    def lookup(self, keyStream):
+        candidates = []
+
+        for offset in range(len(keyStream) - self.prefixBits + 1):
+            for state in self.lookupPrefix(keyStream[offset:offset + self.prefixBits]):
+                if self.parameters.getKeyStream(state, len(keyStream) - offset) == list(keyStream[offset:]):
+                    candidates.append((offset, state))
+
+        return candidates
+
+    #Finds the candidate states right after the key was loaded, by rolling every state found by lookup back to the
+    #...start of the keystream.
+    def recoverInitialStates(self, keyStream):
+        initialStates = set()
+
+        for offset, state in self.lookup(keyStream):
+            for initialState in rollBack(state, offset, self.parameters):
+                if self.parameters.getKeyStream(initialState, len(keyStream)) == list(keyStream):
+                    initialStates.add(initialState)
+
+        return initialStates
+
+#A read-only sequence of the prefixes in a StateTable, so bisect can search the memory mapped records directly.
+class PrefixView:
+
+    def __init__(self, table):
+        self.table = table
+
+    def __len__(self):
+        return len(self.table)
+
+    def __getitem__(self, index):
+        return self.table.getPrefix(index)
+
+#Converts a (x, y, z) state to the key string which fillRegisters (or A51) would load it from.
+def stateToKey(state, parameters=fullSize):
+    return "".join(str((state[r] >> i) & 1) for r in range(3) for i in range(parameters.lengths[r]))
+
+#Builds a table for the reduced-size variant and recovers the initial state of a random key from its keystream.
+def main():
+    import tempfile
+    import time
+
+    parameters = reducedSize
+    prefixBits = 20
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "reduced.a51t")
+
+        start = time.perf_counter()
+        recordCount = buildTable(path, prefixBits=prefixBits, parameters=parameters)
+        print("Built table with %d records in %.2fs" % (recordCount, time.perf_counter() - start))
+
+        initialState = parameters.unpackState(random.getrandbits(parameters.stateBits))
+        keyStream = parameters.getKeyStream(initialState, 64)
+
+        with StateTable(path) as table:
+            start = time.perf_counter()
+            recovered = table.recoverInitialStates(keyStream)
+            print("Recovered %d candidate initial state(s) in %.3fs" % (len(recovered), time.perf_counter() - start))
+            print("Actual initial state found:", initialState in recovered)
+
+
+if __name__ == "__main__":
+    main()
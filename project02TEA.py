@@ -1,14 +1,44 @@
 import ctypes
 from typing import List
 import random
+import os
+import sys
+import mmap
+import asyncio
+import time
+import json
+import atexit
+import cProfile
+import pstats
+import functools
+import inspect
+import contextlib
+import tempfile
+from array import array
+from collections import OrderedDict
+from concurrent.futures import Executor, ProcessPoolExecutor, as_completed
+
+# NumPy is optional, and is only used by the "numpy" backend. If it is not installed, that backend will fall back to the "int" backend.
+try:
+	import numpy
+except ImportError:
+	numpy = None
 
 delta = 0x9E3779B9
 decrypt_sum = 0xC6EF3720
 maximum_displayed_int_list_elements = 10
 limit_encryption_to_hex = True
+uint32_mask = 0xFFFFFFFF
 
-# Set the seed of random to 0, making all initialization vectors generation deterministic.
-random.seed(0)
+# Backends which can be used for the int list functions. "int" uses the plain int kernel, "numpy" runs the rounds over every block of the list at once using NumPy arrays, and "reference" uses the original UInt32 based encrypt()/decrypt() and is kept for validating the other backends. "auto" picks "numpy" when it is installed and the list is large enough to make up for the array setup cost, and "int" otherwise.
+backends = ("auto", "int", "numpy", "reference")
+default_backend = "auto"
+
+# The minimum number of 2 int TEA blocks an int list needs before the "auto" backend will use NumPy.
+numpy_minimum_blocks = 64
+
+# A random number generator seeded with 0, making all initialization vectors generation deterministic. A separate instance is used so importing this module does not reseed the global 'random' module.
+initialization_vector_random = random.Random(0)
 
 # 'int' in Python is a traditional 32 bit machine value which is automatically promoted to a 64 bit machine value, which is finally promoted to a "infinite" length value. This behavior is extremely different from the original C uint32_t value, making the original code incompatible without converting to a representation which replicates the original C value. ctypes.c_uint32 will convert a Python number into the corresponding c_uint32 (unsigned 32 bit integer), which allows for the replication of the original C behavior.
 def uint32_cast(number : int):
@@ -97,6 +127,98 @@ def decrypt(v : List[int], k : List[int]):
 	# Return a new array with the Python-version of the numbers from the UInt32's.
 	return [v0.number, v1.number]
 
+# The value of 'sum' during each of the 32 rounds of encrypt(). 'sum' only depends on delta and the round number, so it can be computed once instead of once per round per block. The last value is equal to decrypt_sum, and decryption walks these values in reverse.
+round_sums = tuple(((i + 1) * delta) & uint32_mask for i in range(32))
+
+# The round sums in the order decrypt() uses them.
+reversed_round_sums = tuple(reversed(round_sums))
+
+# TEA kernels working on plain Python ints. Each round takes its 'sum' from round_sums, and results are kept within 32 bits by masking with uint32_mask rather than going through UInt32 and ctypes. Masking only after each addition/subtraction gives the same result as the UInt32 version, as the low 32 bits of a sum, difference or xor only depend on the low 32 bits of its operands. Both take the two halves of the block and the four key words as (already masked) ints, and return the resulting halves as a tuple.
+def encrypt_rounds(v0 : int, v1 : int, k0 : int, k1 : int, k2 : int, k3 : int):
+	for sum in round_sums:
+		v0 = (v0 + ((((v1 << 4) + k0) ^ (v1 + sum) ^ ((v1 >> 5) + k1)))) & uint32_mask
+		v1 = (v1 + ((((v0 << 4) + k2) ^ (v0 + sum) ^ ((v0 >> 5) + k3)))) & uint32_mask
+
+	return v0, v1
+
+def decrypt_rounds(v0 : int, v1 : int, k0 : int, k1 : int, k2 : int, k3 : int):
+	for sum in reversed_round_sums:
+		v1 = (v1 - ((((v0 << 4) + k2) ^ (v0 + sum) ^ ((v0 >> 5) + k3)))) & uint32_mask
+		v0 = (v0 - ((((v1 << 4) + k0) ^ (v1 + sum) ^ ((v1 >> 5) + k1)))) & uint32_mask
+
+	return v0, v1
+
+# Same as encrypt(), but using the plain int kernel. Produces bit-identical output to encrypt().
+def encrypt_fast(v : List[int], k : List[int]):
+	return list(encrypt_rounds(v[0] & uint32_mask, v[1] & uint32_mask, k[0] & uint32_mask, k[1] & uint32_mask, k[2] & uint32_mask, k[3] & uint32_mask))
+
+# Same as decrypt(), but using the plain int kernel. Produces bit-identical output to decrypt().
+def decrypt_fast(v : List[int], k : List[int]):
+	return list(decrypt_rounds(v[0] & uint32_mask, v[1] & uint32_mask, k[0] & uint32_mask, k[1] & uint32_mask, k[2] & uint32_mask, k[3] & uint32_mask))
+
+# Checks that the given backend name is one of the supported backends, raising a ValueError otherwise.
+def check_backend(backend : str):
+	if backend not in backends:
+		raise ValueError("Unknown backend '" + str(backend) + "'. Supported backends are: " + ", ".join(backends))
+
+# Resolves the backend which should actually be used for an int list of the given length, handling "auto" and falling back from "numpy" to "int" when NumPy is not installed.
+def resolve_backend(backend : str, int_list_length : int):
+	check_backend(backend)
+
+	if backend == "auto":
+		if numpy is not None and (int_list_length + 1) // 2 >= numpy_minimum_blocks:
+			return "numpy"
+
+		return "int"
+
+	if backend == "numpy" and numpy is None:
+		return "int"
+
+	return backend
+
+# Converts an int list into two uint32 NumPy arrays holding the first and second int of every TEA block, padding the last block with 0 if the list has an odd length. Ints are masked to 32 bits first, matching the UInt32 conversion done by encrypt()/decrypt().
+def int_list_to_numpy_blocks(int_list : List[int]):
+	length = len(int_list) + (len(int_list) % 2)
+
+	# Packed int arrays can be read directly without going through Python ints.
+	if isinstance(int_list, array) and int_list.itemsize == 4:
+		int_array = numpy.frombuffer(int_list, dtype=numpy.uint32).copy()
+	else:
+		int_array = numpy.fromiter((integer & uint32_mask for integer in int_list), dtype=numpy.uint32, count=len(int_list))
+
+	if length != len(int_list):
+		int_array = numpy.append(int_array, numpy.uint32(0))
+
+	blocks = int_array.reshape(-1, 2)
+
+	return blocks[:, 0].copy(), blocks[:, 1].copy()
+
+# Interleaves the first and second int arrays of the TEA blocks back into a single int list.
+def numpy_blocks_to_int_list(v0, v1):
+	return numpy.stack((v0, v1), axis=1).ravel().tolist()
+
+# Runs the 32 encryption rounds over every TEA block at once. v0 and v1 are uint32 arrays holding the two halves of each block, and are modified in place. NumPy uint32 arithmetic wraps around the same way C uint32_t does, so no masking is needed.
+def numpy_encrypt_rounds(v0, v1, key : List[int]):
+	k0, k1, k2, k3 = (numpy.uint32(k & uint32_mask) for k in key[:4])
+
+	for sum in round_sums:
+		sum = numpy.uint32(sum)
+		v0 += ((v1 << 4) + k0) ^ (v1 + sum) ^ ((v1 >> 5) + k1)
+		v1 += ((v0 << 4) + k2) ^ (v0 + sum) ^ ((v0 >> 5) + k3)
+
+	return v0, v1
+
+# Runs the 32 decryption rounds over every TEA block at once. See numpy_encrypt_rounds().
+def numpy_decrypt_rounds(v0, v1, key : List[int]):
+	k0, k1, k2, k3 = (numpy.uint32(k & uint32_mask) for k in key[:4])
+
+	for sum in reversed(round_sums):
+		sum = numpy.uint32(sum)
+		v1 -= ((v0 << 4) + k2) ^ (v0 + sum) ^ ((v0 >> 5) + k3)
+		v0 -= ((v1 << 4) + k0) ^ (v1 + sum) ^ ((v1 >> 5) + k1)
+
+	return v0, v1
+
 # Converts a string to an int list.
 def string_to_int_list(string : str):
 	int_list = []
@@ -119,12 +241,18 @@ def int_list_to_string(int_list : List[int]):
 	return output_string
 
 # Will take a string and encrypt the Unicode-chars bytes.
-def encrypt_string(string : str, key : List[int]):
-	return encrypt_int_list(int_list=string_to_int_list(string=string), key=key)
+def encrypt_string(string : str, key : List[int], backend : str = default_backend):
+	return encrypt_int_list(int_list=string_to_int_list(string=string), key=key, backend=backend)
 
 # Will take an int list and encrypt the values using the key parameter.
-def encrypt_int_list(int_list : List[int], key : List[int]):
+def encrypt_int_list(int_list : List[int], key : List[int], backend : str = default_backend):
+	backend = resolve_backend(backend, len(int_list))
+
+	if backend == "numpy":
+		return numpy_blocks_to_int_list(*numpy_encrypt_rounds(*int_list_to_numpy_blocks(int_list), key))
+
 	encrypted_int_list = []
+	k0, k1, k2, k3 = key[0] & uint32_mask, key[1] & uint32_mask, key[2] & uint32_mask, key[3] & uint32_mask
 
 	for i in range(0, len(int_list), 2):
 		# Iterate every int, only grabbing the second int if it is not our-of-bounds for the int list.
@@ -135,7 +263,10 @@ def encrypt_int_list(int_list : List[int], key : List[int]):
 			second_int = int_list[i + 1]
 
 		# Encrypt the bytes using the key parameter.
-		encrypted_int_tuple = encrypt([first_int, second_int], key)
+		if backend == "reference":
+			encrypted_int_tuple = encrypt([first_int, second_int], key)
+		else:
+			encrypted_int_tuple = encrypt_rounds(first_int & uint32_mask, second_int & uint32_mask, k0, k1, k2, k3)
 
 		# Append the encrypted ints to the encrypted int list.
 		encrypted_int_list.append(encrypted_int_tuple[0])
@@ -143,8 +274,14 @@ def encrypt_int_list(int_list : List[int], key : List[int]):
 
 	return encrypted_int_list
 
-def decrypt_int_list(int_list : List[int], key : List[int]):
+def decrypt_int_list(int_list : List[int], key : List[int], backend : str = default_backend):
+	backend = resolve_backend(backend, len(int_list))
+
+	if backend == "numpy":
+		return numpy_blocks_to_int_list(*numpy_decrypt_rounds(*int_list_to_numpy_blocks(int_list), key))
+
 	decrypted_int_list = []
+	k0, k1, k2, k3 = key[0] & uint32_mask, key[1] & uint32_mask, key[2] & uint32_mask, key[3] & uint32_mask
 
 	for i in range(0, len(int_list), 2):
 		# Iterate every int, only grabbing the second int if it is not our-of-bounds for the int list.
@@ -156,7 +293,10 @@ def decrypt_int_list(int_list : List[int], key : List[int]):
 			second_int = int_list[i + 1]
 
 		# Decrypt the ints using the key parameter.
-		decrypted_int_tuple = decrypt([first_int, second_int], key)
+		if backend == "reference":
+			decrypted_int_tuple = decrypt([first_int, second_int], key)
+		else:
+			decrypted_int_tuple = decrypt_rounds(first_int & uint32_mask, second_int & uint32_mask, k0, k1, k2, k3)
 
 		# Append the decrypted ints converted back to a char to the output string.
 		decrypted_int_list.append(decrypted_int_tuple[0])
@@ -164,11 +304,11 @@ def decrypt_int_list(int_list : List[int], key : List[int]):
 
 	return decrypted_int_list
 
-def decrypt_int_list_string(int_list : List[int], key : List[int]):
+def decrypt_int_list_string(int_list : List[int], key : List[int], backend : str = default_backend):
 	# TODO: Should use a StringBuilder-like object to speed this up. See https://stackoverflow.com/questions/10572624/mutable-strings-in-python/10572792#10572792
 	output_string = ""
 
-	decrypted_int_list = decrypt_int_list(int_list=int_list, key=key)
+	decrypted_int_list = decrypt_int_list(int_list=int_list, key=key, backend=backend)
 
 	for i in range(0, len(int_list), 2):
 		# Iterate every int, only grabbing the second int if it is not our-of-bounds for the int list.
@@ -185,12 +325,65 @@ def decrypt_int_list_string(int_list : List[int], key : List[int]):
 
 	return output_string
 
+# The array type code holding unsigned 32 bit ints, used for the packed encoding. 'I' is 32 bits on all common platforms, but C only guarantees it to be at least 16 bits.
+packed_type_code = "I" if array("I").itemsize == 4 else "L"
+
+# The byte appended to the UTF-8 bytes of a string before padding in the packed encoding. Using 0x80 followed by 0x00's (ISO/IEC 7816-4 padding) means the padding can always be removed by stripping trailing 0x00's and then the 0x80, even if extra 0 ints were appended afterwards (such as by generate_blocks()).
+packed_padding_marker = 0x80
+
+# Converts a string to a packed int array. Unlike string_to_int_list(), which uses a whole 32 bit int per character, the string is UTF-8 encoded and 4 bytes are packed into each int (big-endian), so ASCII text takes a quarter of the ints. The bytes are padded so the number of ints is a multiple of 'block_size' (which should be the CBC block size, or 2 for a single TEA block).
+def string_to_packed_int_list(string : str, block_size : int = 2):
+	string_bytes = bytearray(string.encode("utf-8"))
+	string_bytes.append(packed_padding_marker)
+
+	block_byte_count = 4 * block_size
+	string_bytes.extend(bytes(-len(string_bytes) % block_byte_count))
+
+	return bytes_to_packed_int_list(string_bytes)
+
+# Converts a packed int list created by string_to_packed_int_list() back to a string, removing the padding.
+def packed_int_list_to_string(int_list : List[int]):
+	string_bytes = packed_int_list_to_bytes(int_list).rstrip(b"\x00")
+
+	if len(string_bytes) == 0 or string_bytes[-1] != packed_padding_marker:
+		raise ValueError("The int_list parameter does not end with valid packed padding.")
+
+	return string_bytes[:-1].decode("utf-8")
+
+# Packs a bytes-like object (with a length which is a multiple of 4) into an int array, 4 bytes per int in big-endian order.
+def bytes_to_packed_int_list(data):
+	packed_int_list = array(packed_type_code)
+	packed_int_list.frombytes(data)
+
+	# array uses the machine byte order, so swap the bytes to always be big-endian.
+	if sys.byteorder == "little":
+		packed_int_list.byteswap()
+
+	return packed_int_list
+
+# Unpacks an int list into bytes, 4 bytes per int in big-endian order. This is the reverse of bytes_to_packed_int_list().
+def packed_int_list_to_bytes(int_list : List[int]):
+	packed_int_list = array(packed_type_code, int_list)
+
+	if sys.byteorder == "little":
+		packed_int_list.byteswap()
+
+	return packed_int_list.tobytes()
+
+# Will take a string and encrypt it using the packed encoding (see string_to_packed_int_list()).
+def encrypt_string_packed(string : str, key : List[int], backend : str = default_backend):
+	return encrypt_int_list(int_list=string_to_packed_int_list(string=string), key=key, backend=backend)
+
+# Will take an int list created by encrypt_string_packed() and decrypt it back into a string.
+def decrypt_int_list_string_packed(int_list : List[int], key : List[int], backend : str = default_backend):
+	return packed_int_list_to_string(decrypt_int_list(int_list=int_list, key=key, backend=backend))
+
 def generate_initialization_vector(size : int):
 	initialization_vector : List[int] = []
 
 	for _ in range(size):
 		# Generate a random integer between 0 (inclusive) and 2^32 bits - 1 (inclusive, int32 maximum value).
-		initialization_vector.append(random.randint(0, 2^32 - 1))
+		initialization_vector.append(initialization_vector_random.randint(0, 2^32 - 1))
 
 	return initialization_vector
 
@@ -223,7 +416,7 @@ def pad_list(list : List, multiple : int, pad_object):
 
 # Implementation information can be found here: https://en.wikipedia.org/wiki/Block_cipher_mode_of_operation#Cipher_block_chaining_(CBC)
 # Encrypt an integer list given a key and a xor list. First, the integer list is xored using the xor list, then encrypted using the TEA algorithm.
-def encrypt_xor_vector(int_list : List[int], key : List[int], xor_list : List[int]):
+def encrypt_xor_vector(int_list : List[int], key : List[int], xor_list : List[int], backend : str = default_backend):
 	# Check that the input int_list and the initialization_vector have the same length.
 	if len(int_list) != len(xor_list):
 		raise ValueError("The int_list and initialization_vector parameters had differing lengths. " + str(len(int_list)) + " != " + str(len(xor_list)))
@@ -234,10 +427,10 @@ def encrypt_xor_vector(int_list : List[int], key : List[int], xor_list : List[in
 		# ^ in Python is XOR, see https://docs.python.org/3/library/operator.html#mapping-operators-to-functions
 		xored_list.append(int_list[i] ^ xor_list[i])
 
-	return encrypt_int_list(xored_list, key=key)
+	return encrypt_int_list(xored_list, key=key, backend=backend)
 
 # Encrypt an integer list using CBC given a key, an initial initialization vector, and a block size.
-def cipher_block_chaining_encrypt(int_list : List[int], key : List[int], initialization_vector : List[int], block_size : int):
+def cipher_block_chaining_encrypt(int_list : List[int], key : List[int], initialization_vector : List[int], block_size : int, backend : str = default_backend):
 	int_list = pad_list(int_list, 2, 0)
 
 	blocks = generate_blocks(int_list=int_list, block_size=block_size)
@@ -247,7 +440,7 @@ def cipher_block_chaining_encrypt(int_list : List[int], key : List[int], initial
 
 	# For every block, encrypt the integers in the block using the key, then xor with the xor list (which will either be the initialization vector or the previously encrypted block).
 	for block in blocks:
-		new_encrypted_block = encrypt_xor_vector(int_list=block, key=key, xor_list=xor_list)
+		new_encrypted_block = encrypt_xor_vector(int_list=block, key=key, xor_list=xor_list, backend=backend)
 
 		for integer in new_encrypted_block:
 			encrypted_int_list.append(integer)
@@ -257,14 +450,14 @@ def cipher_block_chaining_encrypt(int_list : List[int], key : List[int], initial
 	return encrypted_int_list
 
 # Decrypt an integer list given a key and a xor list. First, the integer list is decrypted using the key, then xored with the xor list.
-def decrypt_xor_vector(int_list : List[int], key : List[int], xor_list : List[int]):
+def decrypt_xor_vector(int_list : List[int], key : List[int], xor_list : List[int], backend : str = default_backend):
 	# Check that the input int_list and the initialization_vector have the same length.
 	if len(int_list) != len(xor_list):
 		raise ValueError("The int_list and initialization_vector parameters had differing lengths. " + str(len(int_list)) + " != " + str(len(xor_list)))
 
 	xored_list : List[int] = []
 
-	decrypted_int_list = decrypt_int_list(int_list, key=key)
+	decrypted_int_list = decrypt_int_list(int_list, key=key, backend=backend)
 
 	for i in range(len(decrypted_int_list)):
 		# ^ in Python is XOR, see https://docs.python.org/3/library/operator.html#mapping-operators-to-functions
@@ -272,26 +465,767 @@ def decrypt_xor_vector(int_list : List[int], key : List[int], xor_list : List[in
 
 	return xored_list
 
-# Decrypt an integer list using CBC given a key, an initial initialization vector, and a block size.
-def cipher_block_chaining_decrypt(int_list : List[int], key : List[int], initialization_vector : List[int], block_size : int):
+# Decrypt an integer list using CBC given a key, an initial initialization vector, and a block size. Unlike encryption, every block can be decrypted independently, so all blocks are decrypted in a single decrypt_int_list() pass (letting the "auto" backend use NumPy for large lists) and then xored with the initialization vector followed by the ciphertext shifted by one block. See cipher_block_chaining_decrypt_chunk().
+def cipher_block_chaining_decrypt(int_list : List[int], key : List[int], initialization_vector : List[int], block_size : int, backend : str = default_backend):
+	if len(initialization_vector) != block_size:
+		raise ValueError("The block_size and initialization_vector parameters had differing lengths. " + str(block_size) + " != " + str(len(initialization_vector)))
+
 	int_list = pad_list(int_list, 2, 0)
 
 	blocks = generate_blocks(int_list=int_list, block_size=block_size)
 
-	decrypted_int_list : List[int] = []
-	xor_list = initialization_vector.copy()
+	if len(blocks) == 0:
+		return []
 
-	# For every block, decrypt the integers in the block by xoring with the list (which will either be the initialization vector or the previously encrypted block), then using the key to decrypt.
-	for block in blocks:
-		new_decrypted_block = decrypt_xor_vector(int_list=block, key=key, xor_list=xor_list)
+	return cipher_block_chaining_decrypt_chunk(blocks, key=key, previous_block=initialization_vector.copy(), backend=backend)
+
+# Encrypt a string using CBC with the packed encoding, given a key, an initial initialization vector, and a block size.
+def cipher_block_chaining_encrypt_string(string : str, key : List[int], initialization_vector : List[int], block_size : int, backend : str = default_backend):
+	return cipher_block_chaining_encrypt(string_to_packed_int_list(string=string, block_size=block_size), key=key, initialization_vector=initialization_vector, block_size=block_size, backend=backend)
+
+# Decrypt an int list created by cipher_block_chaining_encrypt_string() back into a string.
+def cipher_block_chaining_decrypt_string(int_list : List[int], key : List[int], initialization_vector : List[int], block_size : int, backend : str = default_backend):
+	return packed_int_list_to_string(cipher_block_chaining_decrypt(int_list, key=key, initialization_vector=initialization_vector, block_size=block_size, backend=backend))
+
+# Splits every message into CBC blocks for encrypt_many()/decrypt_many(), checking that each initialization vector matches the block size.
+def generate_message_blocks(messages : List[List[int]], initialization_vectors : List[List[int]], block_size : int):
+	if block_size % 2 != 0:
+		raise ValueError("The block_size parameter must be a multiple of two. " + str(block_size) + " % 2 != 0")
+
+	if len(messages) != len(initialization_vectors):
+		raise ValueError("The messages and initialization_vectors parameters had differing lengths. " + str(len(messages)) + " != " + str(len(initialization_vectors)))
+
+	message_blocks : List[List[List[int]]] = []
+
+	for message, initialization_vector in zip(messages, initialization_vectors):
+		if len(initialization_vector) != block_size:
+			raise ValueError("The block_size and initialization_vector parameters had differing lengths. " + str(block_size) + " != " + str(len(initialization_vector)))
+
+		# Copy the message, as pad_list() modifies the list it is given.
+		message_blocks.append(generate_blocks(int_list=pad_list(list(message), 2, 0), block_size=block_size))
+
+	return message_blocks
+
+# Encrypt many independent messages using CBC, each with its own initialization vector, returning the encrypted int lists in the same order. The output is identical to calling cipher_block_chaining_encrypt() on each message. Within a message the blocks still have to be encrypted one after another, but block i of every message is encrypted together in a single pass, so the per-call overhead is paid once per block index instead of once per block.
+def encrypt_many(messages : List[List[int]], key : List[int], initialization_vectors : List[List[int]], block_size : int, backend : str = default_backend):
+	message_blocks = generate_message_blocks(messages=messages, initialization_vectors=initialization_vectors, block_size=block_size)
+	backend = resolve_backend(backend, len(messages) * block_size)
+
+	# Process the messages from longest to shortest, so the messages which still have blocks left are always the first 'active' ones.
+	order = sorted(range(len(messages)), key=lambda i: len(message_blocks[i]), reverse=True)
+	block_counts = [len(message_blocks[i]) for i in order]
+	maximum_block_count = block_counts[0] if len(block_counts) > 0 else 0
+
+	encrypted_messages : List[List[int]] = [[] for _ in messages]
+
+	if backend == "numpy":
+		# Lay out every message as a row of the same length, padded with 0's past the end of the shorter messages.
+		plain_rows = numpy.zeros((len(messages), maximum_block_count * block_size), dtype=numpy.uint32)
+		for row, i in enumerate(order):
+			for block_index, block in enumerate(message_blocks[i]):
+				plain_rows[row, block_index * block_size:(block_index + 1) * block_size] = [integer & uint32_mask for integer in block]
+
+		xor_rows = numpy.array([[integer & uint32_mask for integer in initialization_vectors[i]] for i in order], dtype=numpy.uint32).reshape(len(messages), block_size)
+		encrypted_rows = numpy.empty_like(plain_rows)
+
+		active = len(messages)
+		for block_index in range(maximum_block_count):
+			while block_counts[active - 1] <= block_index:
+				active -= 1
+
+			columns = slice(block_index * block_size, (block_index + 1) * block_size)
+			pairs = (plain_rows[:active, columns] ^ xor_rows[:active]).reshape(-1, 2)
+
+			v0, v1 = numpy_encrypt_rounds(pairs[:, 0].copy(), pairs[:, 1].copy(), key)
+			encrypted_block = numpy.stack((v0, v1), axis=1).reshape(active, block_size)
+
+			encrypted_rows[:active, columns] = encrypted_block
+			xor_rows[:active] = encrypted_block
+
+		for row, i in enumerate(order):
+			encrypted_messages[i] = encrypted_rows[row, :block_counts[row] * block_size].tolist()
+
+		return encrypted_messages
+
+	xor_lists = [initialization_vector.copy() for initialization_vector in initialization_vectors]
+
+	active = len(messages)
+	for block_index in range(maximum_block_count):
+		while block_counts[active - 1] <= block_index:
+			active -= 1
+
+		# Xor block i of every active message with its xor list, and encrypt them all in one call.
+		xored_list : List[int] = []
+		for i in order[:active]:
+			block = message_blocks[i][block_index]
+			xor_list = xor_lists[i]
+			xored_list.extend(block[j] ^ xor_list[j] for j in range(block_size))
+
+		encrypted_int_list = encrypt_int_list(xored_list, key=key, backend=backend)
+
+		for position, i in enumerate(order[:active]):
+			encrypted_block = encrypted_int_list[position * block_size:(position + 1) * block_size]
+			encrypted_messages[i].extend(encrypted_block)
+			xor_lists[i] = encrypted_block
+
+	return encrypted_messages
+
+# Decrypt many independent messages encrypted using CBC, returning the decrypted int lists in the same order. The output is identical to calling cipher_block_chaining_decrypt() on each message. As CBC decryption has no dependency between blocks, every block of every message is decrypted in a single decrypt_int_list() call, then xored with the previous ciphertext block of its own message.
+def decrypt_many(messages : List[List[int]], key : List[int], initialization_vectors : List[List[int]], block_size : int, backend : str = default_backend):
+	message_blocks = generate_message_blocks(messages=messages, initialization_vectors=initialization_vectors, block_size=block_size)
+
+	encrypted_int_list : List[int] = [integer for blocks in message_blocks for block in blocks for integer in block]
+	decrypted_int_list = decrypt_int_list(encrypted_int_list, key=key, backend=backend)
+
+	decrypted_messages : List[List[int]] = []
+
+	start = 0
+	for blocks, initialization_vector in zip(message_blocks, initialization_vectors):
+		end = start + len(blocks) * block_size
 
-		for integer in new_decrypted_block:
-			decrypted_int_list.append(integer)
+		# Each block is xored with the ciphertext block before it, or the initialization vector for the first block.
+		xor_list = initialization_vector + encrypted_int_list[start:end - block_size] if end > start else []
+		decrypted_messages.append([decrypted_int_list[start + i] ^ xor_list[i] for i in range(end - start)])
 
-		xor_list = block
+		start = end
+
+	return decrypted_messages
+
+# Decrypts a contiguous run of CBC blocks. Unlike encryption, CBC decryption of a block only depends on its own ciphertext and the previous ciphertext block, so any run of blocks can be decrypted on its own as long as the ciphertext block before it (or the initialization vector for the first run) is known. The whole run is decrypted in a single decrypt_xor_vector() call, so it also benefits from the "numpy" backend.
+def cipher_block_chaining_decrypt_chunk(blocks : List[List[int]], key : List[int], previous_block : List[int], backend : str = default_backend):
+	int_list : List[int] = [integer for block in blocks for integer in block]
+
+	# Each block is xored with the ciphertext block before it, which is the previous block for the first block in the chunk.
+	xor_list : List[int] = previous_block + int_list[:len(int_list) - len(blocks[-1])]
+
+	return decrypt_xor_vector(int_list=int_list, key=key, xor_list=xor_list, backend=backend)
+
+# Decrypt an integer list using CBC like cipher_block_chaining_decrypt(), but split the blocks into chunks which are decrypted across multiple processes. The output is identical to cipher_block_chaining_decrypt(). 'jobs' controls the number of worker processes (defaulting to the CPU count) and 'chunk_blocks' the number of blocks given to each task. An existing executor can be passed in to avoid starting a new process pool on every call.
+def parallel_cipher_block_chaining_decrypt(int_list : List[int], key : List[int], initialization_vector : List[int], block_size : int, backend : str = default_backend, jobs : int = None, chunk_blocks : int = None, executor : Executor = None):
+	check_backend(backend)
+
+	int_list = pad_list(int_list, 2, 0)
+
+	blocks = generate_blocks(int_list=int_list, block_size=block_size)
+
+	if len(blocks) == 0:
+		return []
+
+	# Match the check done by decrypt_xor_vector() on the first block in the serial version.
+	if len(blocks[0]) != len(initialization_vector):
+		raise ValueError("The int_list and initialization_vector parameters had differing lengths. " + str(len(blocks[0])) + " != " + str(len(initialization_vector)))
+
+	if jobs is None:
+		jobs = os.cpu_count() or 1
+
+	# By default, give each worker a few chunks so that uneven workers do not leave the others idle at the end.
+	if chunk_blocks is None:
+		chunk_blocks = max(1, -(-len(blocks) // (jobs * 4)))
+
+	# Every chunk is given the ciphertext block just before it, or the initialization vector for the first chunk.
+	chunks = []
+	for i in range(0, len(blocks), chunk_blocks):
+		previous_block = initialization_vector.copy() if i == 0 else blocks[i - 1]
+		chunks.append((blocks[i:i + chunk_blocks], previous_block))
+
+	decrypted_int_list : List[int] = []
+
+	for decrypted_chunk in run_chunks(cipher_block_chaining_decrypt_chunk, [(chunk, key, previous_block, backend) for chunk, previous_block in chunks], jobs=jobs, executor=executor):
+		decrypted_int_list.extend(decrypted_chunk)
 
 	return decrypted_int_list
 
+# Calls 'function' once for every tuple of arguments in 'argument_list', returning the results in the same order. The calls are spread across a ProcessPoolExecutor with 'jobs' workers, or the given executor if one is passed in. If there is nothing to run in parallel, the calls are made directly to avoid the cost of starting a process pool.
+def run_chunks(function, argument_list : List[tuple], jobs : int = None, executor : Executor = None):
+	if jobs is None:
+		jobs = os.cpu_count() or 1
+
+	if executor is None and (jobs <= 1 or len(argument_list) <= 1):
+		return [function(*arguments) for arguments in argument_list]
+
+	owns_executor = executor is None
+	if owns_executor:
+		executor = ProcessPoolExecutor(max_workers=jobs)
+
+	try:
+		futures = [executor.submit(function, *arguments) for arguments in argument_list]
+
+		return [future.result() for future in futures]
+	finally:
+		if owns_executor:
+			executor.shutdown()
+
+# Same as run_chunks(), but yields each result as soon as its task finishes rather than waiting for all of them, so the results are not in the order of 'argument_list'.
+def run_chunks_as_completed(function, argument_list : List[tuple], jobs : int = None, executor : Executor = None):
+	if jobs is None:
+		jobs = os.cpu_count() or 1
+
+	if executor is None and (jobs <= 1 or len(argument_list) <= 1):
+		for arguments in argument_list:
+			yield function(*arguments)
+		return
+
+	owns_executor = executor is None
+	if owns_executor:
+		executor = ProcessPoolExecutor(max_workers=jobs)
+
+	try:
+		futures = [executor.submit(function, *arguments) for arguments in argument_list]
+
+		for future in as_completed(futures):
+			yield future.result()
+	finally:
+		if owns_executor:
+			executor.shutdown(cancel_futures=True)
+
+# The number of TEA blocks a counter can address. The counter takes up the second half of each TEA block, so it is limited to 32 bits.
+counter_mode_maximum_blocks = uint32_mask + 1
+
+# Generates a random nonce for counter mode.
+def generate_nonce():
+	return initialization_vector_random.randint(0, uint32_mask)
+
+# Implementation information can be found here: https://en.wikipedia.org/wiki/Block_cipher_mode_of_operation#Counter_(CTR)
+# Generates the counter mode keystream for 'block_count' TEA blocks starting at block 'first_block'. Each block of keystream is the TEA encryption of [nonce, counter], so any block of keystream can be generated without generating the blocks before it.
+def generate_counter_keystream(key : List[int], nonce : int, first_block : int, block_count : int, backend : str = default_backend):
+	if first_block < 0 or first_block + block_count > counter_mode_maximum_blocks:
+		raise ValueError("The counter range " + str(first_block) + " to " + str(first_block + block_count) + " does not fit within a 32 bit counter.")
+
+	counter_list : List[int] = []
+	nonce = nonce & uint32_mask
+
+	for counter in range(first_block, first_block + block_count):
+		counter_list.append(nonce)
+		counter_list.append(counter)
+
+	return encrypt_int_list(counter_list, key=key, backend=backend)
+
+# Xors an int list with the counter mode keystream, where the first int of the list is the first int of block 'first_block'. As xor is its own inverse, this is used for both encryption and decryption.
+def counter_mode_xor_chunk(int_list : List[int], key : List[int], nonce : int, first_block : int, backend : str = default_backend):
+	keystream = generate_counter_keystream(key=key, nonce=nonce, first_block=first_block, block_count=(len(int_list) + 1) // 2, backend=backend)
+
+	return [int_list[i] ^ keystream[i] for i in range(len(int_list))]
+
+# Encrypt an integer list using counter mode given a key and a nonce. Unlike CBC, no padding is required (the output has the same length as the input), and every block is independent, so the list is split into chunks of 'chunk_blocks' TEA blocks which are encrypted across 'jobs' worker processes (see run_chunks()).
+def counter_mode_encrypt(int_list : List[int], key : List[int], nonce : int, backend : str = default_backend, jobs : int = None, chunk_blocks : int = None, executor : Executor = None):
+	check_backend(backend)
+
+	block_count = (len(int_list) + 1) // 2
+
+	if block_count > counter_mode_maximum_blocks:
+		raise ValueError("The int_list parameter is too long for a 32 bit counter. " + str(block_count) + " > " + str(counter_mode_maximum_blocks))
+
+	if jobs is None:
+		jobs = os.cpu_count() or 1
+
+	if chunk_blocks is None:
+		chunk_blocks = max(1, -(-block_count // (jobs * 4)))
+
+	# Chunks always start on a TEA block boundary, so each chunk can work out its first counter from its offset.
+	argument_list = []
+	for i in range(0, len(int_list), chunk_blocks * 2):
+		argument_list.append((int_list[i:i + chunk_blocks * 2], key, nonce, i // 2, backend))
+
+	output_int_list : List[int] = []
+
+	for output_chunk in run_chunks(counter_mode_xor_chunk, argument_list, jobs=jobs, executor=executor):
+		output_int_list.extend(output_chunk)
+
+	return output_int_list
+
+# Decrypt an integer list using counter mode given a key and a nonce. Counter mode decryption is the same operation as encryption.
+def counter_mode_decrypt(int_list : List[int], key : List[int], nonce : int, backend : str = default_backend, jobs : int = None, chunk_blocks : int = None, executor : Executor = None):
+	return counter_mode_encrypt(int_list=int_list, key=key, nonce=nonce, backend=backend, jobs=jobs, chunk_blocks=chunk_blocks, executor=executor)
+
+# Decrypt only 'length' ints starting at int 'offset' of a counter mode encrypted int list, without decrypting anything before it. Only the keystream for the TEA blocks covering the requested range is generated.
+def counter_mode_decrypt_range(int_list : List[int], key : List[int], nonce : int, offset : int, length : int, backend : str = default_backend):
+	if offset < 0 or length < 0:
+		raise ValueError("The offset and length parameters must not be negative. offset=" + str(offset) + ", length=" + str(length))
+
+	end = min(offset + length, len(int_list))
+
+	if offset >= end:
+		return []
+
+	# Widen the range to whole TEA blocks, then trim the decrypted ints back down to the requested range.
+	first_block = offset // 2
+	decrypted_int_list = counter_mode_xor_chunk(int_list[first_block * 2:end], key=key, nonce=nonce, first_block=first_block, backend=backend)
+
+	return decrypted_int_list[offset - first_block * 2:]
+
+# Xors bytes with the counter mode keystream, where the first byte is the first byte of block 'first_block'. The keystream ints are unpacked as big-endian bytes, so this gives the same result as counter_mode_encrypt() on the packed ints of the data. The data does not need to be a whole number of blocks.
+def counter_mode_xor_bytes(data, key : List[int], nonce : int, first_block : int, backend : str = default_backend):
+	keystream_bytes = packed_int_list_to_bytes(generate_counter_keystream(key=key, nonce=nonce, first_block=first_block, block_count=(len(data) + 7) // 8, backend=backend))
+
+	return (int.from_bytes(data, "big") ^ int.from_bytes(keystream_bytes[:len(data)], "big")).to_bytes(len(data), "big")
+
+# The approximate number of bytes processed at a time by the file functions. Only one chunk of the file is converted to ints at a time, so memory use does not depend on the size of the file.
+file_chunk_size = 1 << 20
+
+# Returns the number of bytes to process per chunk for the file functions, rounded down to a whole number of CBC blocks.
+def get_file_chunk_size(block_size : int):
+	block_byte_count = 4 * block_size
+
+	return max(block_byte_count, file_chunk_size - file_chunk_size % block_byte_count)
+
+# Memory maps a file for reading. Empty files cannot be memory mapped, so an empty bytes object is returned for them instead.
+def map_input_file(file):
+	if os.fstat(file.fileno()).st_size == 0:
+		return b""
+
+	return mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+# Creates the output file with the given size and memory maps it for writing, returning None for an empty file.
+def map_output_file(file, size : int):
+	file.truncate(size)
+
+	if size == 0:
+		return None
+
+	return mmap.mmap(file.fileno(), size, access=mmap.ACCESS_WRITE)
+
+# Raises a ValueError if 'path_out' is the same file as 'path_in'. The file functions read the input while writing the output, so they cannot work in place.
+def check_distinct_paths(path_in : str, path_out : str):
+	if os.path.exists(path_out) and os.path.samefile(path_in, path_out):
+		raise ValueError("The output file must be different from the input file. " + str(path_out) + " is " + str(path_in))
+
+# Opens a temporary file next to 'path_out' for writing, which is moved over 'path_out' only once the block exits without an error, and removed otherwise. A failure therefore never leaves a partial output file or destroys an existing one. The output is given the permissions of 'path_in', as mkstemp() creates files readable by the owner only.
+@contextlib.contextmanager
+def replace_output_file(path_in : str, path_out : str):
+	file_descriptor, temporary_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path_out)), prefix="." + os.path.basename(path_out) + ".", suffix=".tmp")
+
+	try:
+		with os.fdopen(file_descriptor, "w+b") as output_file:
+			yield output_file
+
+		os.chmod(temporary_path, os.stat(path_in).st_mode & 0o777)
+		os.replace(temporary_path, path_out)
+	except BaseException:
+		with contextlib.suppress(OSError):
+			os.remove(temporary_path)
+		raise
+
+# Encrypt a file using CBC given a key, an initial initialization vector, and a block size, writing the ciphertext to 'path_out'. The file is padded and packed into big-endian ints the same way as string_to_packed_int_list(), so the output is the packed bytes of the ciphertext. The input is memory mapped and walked one chunk at a time, with the last ciphertext block of each chunk used as the initialization vector of the next, and the ciphertext is written into a preallocated memory mapped output file.
+def encrypt_file(path_in : str, path_out : str, key : List[int], initialization_vector : List[int], block_size : int, backend : str = default_backend):
+	check_backend(backend)
+	check_distinct_paths(path_in, path_out)
+
+	block_byte_count = 4 * block_size
+	chunk_size = get_file_chunk_size(block_size)
+
+	with open(path_in, "rb") as input_file, replace_output_file(path_in, path_out) as output_file:
+		input_map = map_input_file(input_file)
+
+		try:
+			input_size = len(input_map)
+
+			# Only the trailing partial block needs padding, which always results in exactly one more block.
+			unpadded_size = input_size - input_size % block_byte_count
+			output_map = map_output_file(output_file, unpadded_size + block_byte_count)
+
+			try:
+				with memoryview(input_map) as input_view:
+					xor_list = initialization_vector.copy()
+
+					for start in range(0, unpadded_size, chunk_size):
+						end = min(start + chunk_size, unpadded_size)
+
+						encrypted_int_list = cipher_block_chaining_encrypt(bytes_to_packed_int_list(input_view[start:end]), key=key, initialization_vector=xor_list, block_size=block_size, backend=backend)
+						output_map[start:end] = packed_int_list_to_bytes(encrypted_int_list)
+
+						xor_list = encrypted_int_list[-block_size:]
+
+					# Pad the remaining bytes the same way as string_to_packed_int_list().
+					last_block_bytes = bytearray(input_view[unpadded_size:])
+					last_block_bytes.append(packed_padding_marker)
+					last_block_bytes.extend(bytes(block_byte_count - len(last_block_bytes)))
+
+				encrypted_int_list = cipher_block_chaining_encrypt(bytes_to_packed_int_list(last_block_bytes), key=key, initialization_vector=xor_list, block_size=block_size, backend=backend)
+				output_map[unpadded_size:] = packed_int_list_to_bytes(encrypted_int_list)
+			finally:
+				output_map.close()
+		finally:
+			if isinstance(input_map, mmap.mmap):
+				input_map.close()
+
+# Decrypt a file created by encrypt_file() given the same key, initialization vector, and block size, writing the plaintext to 'path_out'. The last block is decrypted first to find the amount of padding, so the output file can be preallocated at its final size. Each chunk is decrypted as a whole by cipher_block_chaining_decrypt_chunk(), as CBC decryption does not need to be done one block at a time.
+def decrypt_file(path_in : str, path_out : str, key : List[int], initialization_vector : List[int], block_size : int, backend : str = default_backend):
+	check_backend(backend)
+
+	block_byte_count = 4 * block_size
+	chunk_size = get_file_chunk_size(block_size)
+
+	if len(initialization_vector) != block_size:
+		raise ValueError("The block_size and initialization_vector parameters had differing lengths. " + str(block_size) + " != " + str(len(initialization_vector)))
+
+	check_distinct_paths(path_in, path_out)
+
+	with open(path_in, "rb") as input_file:
+		input_map = map_input_file(input_file)
+
+		try:
+			input_size = len(input_map)
+
+			if input_size == 0 or input_size % block_byte_count != 0:
+				raise ValueError("The input file size must be a non-zero multiple of the block size in bytes. " + str(input_size) + " % " + str(block_byte_count) + " != 0")
+
+			with memoryview(input_map) as input_view:
+				# Decrypt the last block to find where the padding starts. This is checked before the output file is opened.
+				last_block_start = input_size - block_byte_count
+				previous_block = initialization_vector.copy() if last_block_start == 0 else list(bytes_to_packed_int_list(input_view[last_block_start - block_byte_count:last_block_start]))
+				last_block = list(bytes_to_packed_int_list(input_view[last_block_start:]))
+				last_block_bytes = packed_int_list_to_bytes(cipher_block_chaining_decrypt_chunk([last_block], key, previous_block, backend)).rstrip(b"\x00")
+
+				if len(last_block_bytes) == 0 or last_block_bytes[-1] != packed_padding_marker:
+					raise ValueError("The input file does not end with valid packed padding.")
+
+				output_size = last_block_start + len(last_block_bytes) - 1
+
+				with replace_output_file(path_in, path_out) as output_file:
+					output_map = map_output_file(output_file, output_size)
+
+					try:
+						previous_block = initialization_vector.copy()
+
+						for start in range(0, output_size, chunk_size):
+							end = min(start + chunk_size, input_size)
+							output_end = min(end, output_size)
+
+							encrypted_int_list = bytes_to_packed_int_list(input_view[start:end])
+							blocks = [list(encrypted_int_list[i:i + block_size]) for i in range(0, len(encrypted_int_list), block_size)]
+
+							decrypted_bytes = packed_int_list_to_bytes(cipher_block_chaining_decrypt_chunk(blocks, key, previous_block, backend))
+							output_map[start:output_end] = decrypted_bytes[:output_end - start]
+
+							previous_block = blocks[-1]
+					finally:
+						if output_map is not None:
+							output_map.close()
+		finally:
+			if isinstance(input_map, mmap.mmap):
+				input_map.close()
+
+# Holds a prepared TEA key, so code which encrypts many times with the same key does not have to unpack and mask the key words on every call. The round sums are the same for every key, so the kernels read them from round_sums rather than storing them here.
+class TEAContext:
+	__slots__ = ("key", "k0", "k1", "k2", "k3", "backend")
+
+	def __init__(self, key : List[int], backend : str = default_backend):
+		check_backend(backend)
+
+		self.key = tuple(k & uint32_mask for k in key[:4])
+		self.k0, self.k1, self.k2, self.k3 = self.key
+		self.backend = backend
+
+	def encrypt_block(self, v : List[int]):
+		return list(encrypt_rounds(v[0] & uint32_mask, v[1] & uint32_mask, self.k0, self.k1, self.k2, self.k3))
+
+	def decrypt_block(self, v : List[int]):
+		return list(decrypt_rounds(v[0] & uint32_mask, v[1] & uint32_mask, self.k0, self.k1, self.k2, self.k3))
+
+	def encrypt_int_list(self, int_list : List[int]):
+		return encrypt_int_list(int_list, key=self.key, backend=self.backend)
+
+	def decrypt_int_list(self, int_list : List[int]):
+		return decrypt_int_list(int_list, key=self.key, backend=self.backend)
+
+	# Same as cipher_block_chaining_encrypt() (for even block sizes), but running the kernel directly on each block instead of going through encrypt_xor_vector() and encrypt_int_list() for every block.
+	def cbc_encrypt(self, int_list : List[int], initialization_vector : List[int], block_size : int):
+		if block_size % 2 != 0:
+			raise ValueError("The block_size parameter must be a multiple of two. " + str(block_size) + " % 2 != 0")
+
+		blocks = generate_blocks(int_list=pad_list(list(int_list), 2, 0), block_size=block_size)
+
+		if len(blocks) > 0 and len(initialization_vector) != block_size:
+			raise ValueError("The int_list and initialization_vector parameters had differing lengths. " + str(block_size) + " != " + str(len(initialization_vector)))
+
+		k0, k1, k2, k3 = self.key
+		encrypted_int_list : List[int] = []
+		xor_list = list(initialization_vector)
+
+		for block in blocks:
+			encrypted_block : List[int] = []
+
+			for i in range(0, block_size, 2):
+				v0, v1 = encrypt_rounds((block[i] ^ xor_list[i]) & uint32_mask, (block[i + 1] ^ xor_list[i + 1]) & uint32_mask, k0, k1, k2, k3)
+				encrypted_block.append(v0)
+				encrypted_block.append(v1)
+
+			encrypted_int_list.extend(encrypted_block)
+			xor_list = encrypted_block
+
+		return encrypted_int_list
+
+	# Same as cipher_block_chaining_decrypt() (for even block sizes), decrypting every block at once (see cipher_block_chaining_decrypt_chunk()).
+	def cbc_decrypt(self, int_list : List[int], initialization_vector : List[int], block_size : int):
+		if block_size % 2 != 0:
+			raise ValueError("The block_size parameter must be a multiple of two. " + str(block_size) + " % 2 != 0")
+
+		blocks = generate_blocks(int_list=pad_list(list(int_list), 2, 0), block_size=block_size)
+
+		if len(blocks) == 0:
+			return []
+
+		return cipher_block_chaining_decrypt_chunk(blocks, key=self.key, previous_block=list(initialization_vector), backend=self.backend)
+
+# A bounded least recently used cache of TEAContext's keyed by the key tuple, for services which rotate through many keys. Keeps track of hits, misses and evictions.
+class TEAContextCache:
+	def __init__(self, maximum_size : int = 1024, backend : str = default_backend):
+		if maximum_size < 1:
+			raise ValueError("The maximum_size parameter must be at least 1. " + str(maximum_size) + " < 1")
+
+		check_backend(backend)
+
+		self.maximum_size = maximum_size
+		self.backend = backend
+		self.contexts = OrderedDict()
+		self.hits = 0
+		self.misses = 0
+		self.evictions = 0
+
+	# Returns the context for the given key, creating it (and evicting the least recently used context if the cache is full) if it is not cached.
+	def get(self, key : List[int]) -> TEAContext:
+		cache_key = tuple(k & uint32_mask for k in key[:4])
+		context = self.contexts.get(cache_key)
+
+		if context is not None:
+			self.hits += 1
+			self.contexts.move_to_end(cache_key)
+			return context
+
+		self.misses += 1
+		context = TEAContext(cache_key, backend=self.backend)
+		self.contexts[cache_key] = context
+
+		if len(self.contexts) > self.maximum_size:
+			self.contexts.popitem(last=False)
+			self.evictions += 1
+
+		return context
+
+	def stats(self):
+		return {"size": len(self.contexts), "maximum_size": self.maximum_size, "hits": self.hits, "misses": self.misses, "evictions": self.evictions}
+
+	def clear(self):
+		self.contexts.clear()
+		self.hits = 0
+		self.misses = 0
+		self.evictions = 0
+
+	def __len__(self):
+		return len(self.contexts)
+
+default_context_cache = TEAContextCache()
+
+# Returns the cached TEAContext for the given key from the default context cache.
+def get_context(key : List[int]) -> TEAContext:
+	return default_context_cache.get(key)
+
+# Incrementally encrypts bytes using CBC, for when the whole message is not available at once (such as when sending over a socket). Data can be passed to update() in chunks of any length, and only whole CBC blocks are encrypted; the remainder is kept until more data arrives, and the chaining state (the xor list) is kept between calls. The output is identical to encrypt_file() on the concatenated data.
+class CipherBlockChainingEncryptor:
+	def __init__(self, key : List[int], initialization_vector : List[int], block_size : int, backend : str = default_backend):
+		check_backend(backend)
+
+		if len(initialization_vector) != block_size:
+			raise ValueError("The block_size and initialization_vector parameters had differing lengths. " + str(block_size) + " != " + str(len(initialization_vector)))
+
+		self.key = key
+		self.block_size = block_size
+		self.backend = backend
+		self.xor_list = initialization_vector.copy()
+		self.buffer = bytearray()
+		self.finalized = False
+
+	# Encrypts as many whole blocks as are available, returning the ciphertext bytes (which may be empty).
+	def update(self, data) -> bytes:
+		if self.finalized:
+			raise ValueError("Cannot update an encryptor which has already been finalized.")
+
+		self.buffer.extend(data)
+
+		block_byte_count = 4 * self.block_size
+		end = len(self.buffer) - len(self.buffer) % block_byte_count
+
+		if end == 0:
+			return b""
+
+		encrypted_int_list = cipher_block_chaining_encrypt(bytes_to_packed_int_list(self.buffer[:end]), key=self.key, initialization_vector=self.xor_list, block_size=self.block_size, backend=self.backend)
+		del self.buffer[:end]
+
+		self.xor_list = encrypted_int_list[-self.block_size:]
+
+		return packed_int_list_to_bytes(encrypted_int_list)
+
+	# Pads and encrypts the remaining bytes, returning the final ciphertext block. No more data can be encrypted afterwards.
+	def finalize(self) -> bytes:
+		if self.finalized:
+			raise ValueError("Cannot finalize an encryptor which has already been finalized.")
+
+		# Pad the remaining bytes the same way as string_to_packed_int_list().
+		block_byte_count = 4 * self.block_size
+		self.buffer.append(packed_padding_marker)
+		self.buffer.extend(bytes(-len(self.buffer) % block_byte_count))
+
+		final_bytes = self.update(b"")
+		self.finalized = True
+
+		return final_bytes
+
+# Incrementally decrypts bytes created by CipherBlockChainingEncryptor or encrypt_file(). The last whole block is always held back until more data arrives or finalize() is called, as it may be the block containing the padding.
+class CipherBlockChainingDecryptor:
+	def __init__(self, key : List[int], initialization_vector : List[int], block_size : int, backend : str = default_backend):
+		check_backend(backend)
+
+		if len(initialization_vector) != block_size:
+			raise ValueError("The block_size and initialization_vector parameters had differing lengths. " + str(block_size) + " != " + str(len(initialization_vector)))
+
+		self.key = key
+		self.block_size = block_size
+		self.backend = backend
+		self.previous_block = initialization_vector.copy()
+		self.buffer = bytearray()
+		self.finalized = False
+
+	# Decrypts the given whole blocks of ciphertext bytes, updating the chaining state.
+	def decrypt_blocks(self, data) -> bytes:
+		encrypted_int_list = bytes_to_packed_int_list(data)
+		blocks = [list(encrypted_int_list[i:i + self.block_size]) for i in range(0, len(encrypted_int_list), self.block_size)]
+
+		decrypted_bytes = packed_int_list_to_bytes(cipher_block_chaining_decrypt_chunk(blocks, self.key, self.previous_block, self.backend))
+		self.previous_block = blocks[-1]
+
+		return decrypted_bytes
+
+	# Decrypts as many whole blocks as are available (apart from the last one), returning the plaintext bytes (which may be empty).
+	def update(self, data) -> bytes:
+		if self.finalized:
+			raise ValueError("Cannot update a decryptor which has already been finalized.")
+
+		self.buffer.extend(data)
+
+		block_byte_count = 4 * self.block_size
+		end = len(self.buffer) - len(self.buffer) % block_byte_count - block_byte_count
+
+		if end <= 0:
+			return b""
+
+		decrypted_bytes = self.decrypt_blocks(self.buffer[:end])
+		del self.buffer[:end]
+
+		return decrypted_bytes
+
+	# Decrypts the final block and removes the padding, returning the remaining plaintext bytes. Raises a ValueError if the ciphertext was truncated or the padding is invalid.
+	def finalize(self) -> bytes:
+		if self.finalized:
+			raise ValueError("Cannot finalize a decryptor which has already been finalized.")
+
+		self.finalized = True
+
+		if len(self.buffer) != 4 * self.block_size:
+			raise ValueError("The ciphertext did not end on a whole block. " + str(len(self.buffer)) + " bytes were left over.")
+
+		final_bytes = self.decrypt_blocks(self.buffer).rstrip(b"\x00")
+		self.buffer.clear()
+
+		if len(final_bytes) == 0 or final_bytes[-1] != packed_padding_marker:
+			raise ValueError("The ciphertext does not end with valid packed padding.")
+
+		return final_bytes[:-1]
+
+# Wraps an asyncio.StreamWriter, encrypting everything written to it using a CipherBlockChainingEncryptor. Call drain() after writing to apply backpressure from the underlying transport, and close() to send the final padded block.
+class EncryptedStreamWriter:
+	def __init__(self, writer : asyncio.StreamWriter, key : List[int], initialization_vector : List[int], block_size : int, backend : str = default_backend):
+		self.writer = writer
+		self.encryptor = CipherBlockChainingEncryptor(key=key, initialization_vector=initialization_vector, block_size=block_size, backend=backend)
+
+	def write(self, data):
+		encrypted_bytes = self.encryptor.update(data)
+
+		if len(encrypted_bytes) > 0:
+			self.writer.write(encrypted_bytes)
+
+	async def drain(self):
+		await self.writer.drain()
+
+	# Writes the data and waits until the underlying transport is ready for more.
+	async def send(self, data):
+		self.write(data)
+		await self.drain()
+
+	# Sends the final padded block and closes the write side of the connection, while still allowing data to be read.
+	async def write_eof(self):
+		self.writer.write(self.encryptor.finalize())
+		await self.writer.drain()
+		self.writer.write_eof()
+
+	# Sends the final padded block (if write_eof() has not been called) and closes the underlying writer.
+	async def close(self):
+		try:
+			if not self.encryptor.finalized:
+				self.writer.write(self.encryptor.finalize())
+				await self.writer.drain()
+		finally:
+			self.writer.close()
+			await self.writer.wait_closed()
+
+# Wraps an asyncio.StreamReader, decrypting the data read from it using a CipherBlockChainingDecryptor. Data is only read from the underlying reader once the already decrypted data has been consumed, so the reader's own flow control provides backpressure to the sender.
+class EncryptedStreamReader:
+	def __init__(self, reader : asyncio.StreamReader, key : List[int], initialization_vector : List[int], block_size : int, backend : str = default_backend, read_size : int = 1 << 16):
+		self.reader = reader
+		self.decryptor = CipherBlockChainingDecryptor(key=key, initialization_vector=initialization_vector, block_size=block_size, backend=backend)
+		self.read_size = read_size
+		self.buffer = bytearray()
+		self.eof = False
+
+	# Reads and decrypts the next chunk from the underlying reader into the buffer.
+	async def fill_buffer(self):
+		encrypted_bytes = await self.reader.read(self.read_size)
+
+		if len(encrypted_bytes) == 0:
+			self.buffer.extend(self.decryptor.finalize())
+			self.eof = True
+		else:
+			self.buffer.extend(self.decryptor.update(encrypted_bytes))
+
+	# Reads up to n decrypted bytes, or everything until the end of the stream if n is -1. Returns an empty bytes object at the end of the stream.
+	async def read(self, n : int = -1) -> bytes:
+		# Like asyncio.StreamReader.read(), reading 0 bytes returns immediately instead of waiting for data.
+		if n == 0:
+			return b""
+
+		if n < 0:
+			while not self.eof:
+				await self.fill_buffer()
+		else:
+			while len(self.buffer) == 0 and not self.eof:
+				await self.fill_buffer()
+
+		if n < 0:
+			n = len(self.buffer)
+
+		data = bytes(self.buffer[:n])
+		del self.buffer[:n]
+
+		return data
+
+	# Reads exactly n decrypted bytes, raising an asyncio.IncompleteReadError if the stream ends first.
+	async def readexactly(self, n : int) -> bytes:
+		while len(self.buffer) < n and not self.eof:
+			await self.fill_buffer()
+
+		if len(self.buffer) < n:
+			partial = bytes(self.buffer)
+			self.buffer.clear()
+			raise asyncio.IncompleteReadError(partial, n)
+
+		return await self.read(n)
+
+	def at_eof(self) -> bool:
+		return self.eof and len(self.buffer) == 0
+
+# Wraps both sides of an asyncio connection (such as from asyncio.open_connection() or an asyncio.start_server() callback). Each direction should use its own initialization vector.
+def wrap_encrypted_streams(reader : asyncio.StreamReader, writer : asyncio.StreamWriter, key : List[int], read_initialization_vector : List[int], write_initialization_vector : List[int], block_size : int, backend : str = default_backend):
+	return EncryptedStreamReader(reader, key=key, initialization_vector=read_initialization_vector, block_size=block_size, backend=backend), EncryptedStreamWriter(writer, key=key, initialization_vector=write_initialization_vector, block_size=block_size, backend=backend)
+
 def test_string_encryption():
 	key = [2194012, 1290311, 591021, 952112]
 
@@ -388,5 +1322,308 @@ def main():
 		print("Decrypted Message: " + int_list_to_string(decrypted_int_list))
 		print()
 
+# Parses a comma separated list of ints, accepting any base Python accepts (such as 0x for hex).
+def parse_int_list(text : str):
+	return [int(value, 0) for value in text.split(",") if value.strip() != ""]
+
+# Generates a random initialization vector or nonce word for the command line tool. Unlike generate_initialization_vector(), this is not deterministic, as every file should get a different one.
+def generate_random_word():
+	return int.from_bytes(os.urandom(4), "big")
+
+# Encrypts or decrypts a single file for the command line tool, streaming it in chunks of 'chunk_size' bytes. The output starts with a header holding the initialization vector (CBC) or the nonce (CTR) as big-endian ints, which decryption reads back. Returns the input path, output path, number of bytes read and the time taken, or an error message instead of the time if the file could not be processed.
+def process_file(operation : str, mode : str, path_in : str, path_out : str, key : List[int], block_size : int, chunk_size : int, backend : str, header : List[int] = None):
+	start = time.perf_counter()
+	byte_count = 0
+
+	# The output is written through replace_output_file(), so a failure never leaves a partial output file or destroys an existing one.
+	try:
+		with open(path_in, "rb") as input_file, replace_output_file(path_in, path_out) as output_file:
+			header_size = 4 * (block_size if mode == "cbc" else 1)
+
+			if operation == "encrypt":
+				if header is None:
+					header = [generate_random_word() for _ in range(header_size // 4)]
+
+				output_file.write(packed_int_list_to_bytes(header))
+			else:
+				header_bytes = input_file.read(header_size)
+				byte_count += len(header_bytes)
+
+				if len(header_bytes) != header_size:
+					raise ValueError("The file is too short to contain a " + mode.upper() + " header.")
+
+				header = list(bytes_to_packed_int_list(header_bytes))
+
+			if mode == "cbc":
+				cipher = (CipherBlockChainingEncryptor if operation == "encrypt" else CipherBlockChainingDecryptor)(key=key, initialization_vector=header, block_size=block_size, backend=backend)
+			else:
+				# Counter mode chunks must start on a TEA block boundary.
+				chunk_size = max(8, chunk_size - chunk_size % 8)
+				block_index = 0
+
+			while True:
+				chunk = input_file.read(chunk_size)
+
+				if len(chunk) == 0:
+					break
+
+				byte_count += len(chunk)
+
+				if mode == "cbc":
+					output_file.write(cipher.update(chunk))
+				else:
+					output_file.write(counter_mode_xor_bytes(chunk, key=key, nonce=header[0], first_block=block_index, backend=backend))
+					block_index += len(chunk) // 8
+
+			if mode == "cbc":
+				output_file.write(cipher.finalize())
+	except (OSError, ValueError) as error:
+		return path_in, path_out, byte_count, str(error)
+
+	return path_in, path_out, byte_count, time.perf_counter() - start
+
+# Works out the output path for a file. Encrypted files get 'suffix' appended, while decrypted files have it removed (or get ".dec" appended if they do not end with it).
+def get_output_path(operation : str, path_in : str, suffix : str, output_directory : str = None):
+	if operation == "encrypt":
+		path_out = path_in + suffix
+	elif suffix != "" and path_in.endswith(suffix):
+		path_out = path_in[:-len(suffix)]
+	else:
+		path_out = path_in + ".dec"
+
+	if output_directory is not None:
+		path_out = os.path.join(output_directory, os.path.basename(path_out))
+
+	return path_out
+
+def create_argument_parser():
+	import argparse
+
+	parser = argparse.ArgumentParser(prog="project02TEA", description="Encrypt or decrypt files using TEA in CBC or CTR mode. Running without a command runs the demo.")
+	subparsers = parser.add_subparsers(dest="command")
+
+	subparsers.add_parser("demo", help="Run the hard-coded CBC demo.")
+
+	for operation in ("encrypt", "decrypt"):
+		subparser = subparsers.add_parser(operation, help=operation.capitalize() + " files.")
+		subparser.add_argument("files", nargs="+", help="The files to " + operation + ".")
+		subparser.add_argument("--key", required=True, type=parse_int_list, help="The key as 4 comma separated ints (for example 0xA56BABCD,0,0xFFFFFFFF,0xABCDEF01).")
+		subparser.add_argument("--mode", choices=("cbc", "ctr"), default="cbc")
+		subparser.add_argument("--block-size", type=int, default=8, help="The CBC block size in ints (must be a multiple of two).")
+		subparser.add_argument("--jobs", type=int, default=None, help="The number of files to process at once (defaults to the CPU count).")
+		subparser.add_argument("--chunk-size", type=int, default=file_chunk_size, help="The number of bytes read from each file at a time.")
+		subparser.add_argument("--backend", choices=backends, default=default_backend)
+		subparser.add_argument("--suffix", default=".tea", help="The suffix added to encrypted files, and removed from decrypted files.")
+		subparser.add_argument("--output-dir", default=None, help="Write the output files to this directory instead of next to the input files.")
+
+		if operation == "encrypt":
+			subparser.add_argument("--iv", type=parse_int_list, default=None, help="The CBC initialization vector (or the CTR nonce) as comma separated ints. A random one is generated for every file by default.")
+
+	return parser
+
+# The command line entry point. Files are processed across a process pool (see run_chunks_as_completed()), and the throughput for each file is printed as soon as that file is done. Returns the exit code.
+def command_line_main(arguments : List[str] = None):
+	parser = create_argument_parser()
+	arguments = parser.parse_args(arguments)
+
+	if arguments.command is None or arguments.command == "demo":
+		main()
+		return 0
+
+	if len(arguments.key) != 4:
+		parser.error("--key must have exactly 4 ints.")
+
+	if arguments.block_size < 2 or arguments.block_size % 2 != 0:
+		parser.error("--block-size must be a positive multiple of two.")
+
+	# A chunk size of 0 would read nothing and silently produce the output of an empty file.
+	if arguments.chunk_size < 1:
+		parser.error("--chunk-size must be at least 1.")
+
+	if arguments.output_dir is not None:
+		try:
+			os.makedirs(arguments.output_dir, exist_ok=True)
+		except OSError as error:
+			parser.error("--output-dir could not be created: " + str(error))
+
+	header = None
+	if arguments.command == "encrypt" and arguments.iv is not None:
+		header = arguments.iv
+
+		if len(header) != (arguments.block_size if arguments.mode == "cbc" else 1):
+			parser.error("--iv must have " + (str(arguments.block_size) + " ints for CBC mode." if arguments.mode == "cbc" else "1 int for CTR mode."))
+
+		# Every file would get the same nonce, and so the same keystream, which reveals the XOR of the plaintexts.
+		if arguments.mode == "ctr" and len(arguments.files) > 1:
+			parser.error("--iv cannot be used with CTR mode when encrypting more than one file, as every file needs its own nonce.")
+
+	path_pairs = [(path_in, get_output_path(arguments.command, path_in, arguments.suffix, arguments.output_dir)) for path_in in arguments.files]
+
+	# An output file which is also an input file would be overwritten before (or while) it is read, and two inputs sharing an output file (such as inputs with the same name in different directories with --output-dir) would race on it.
+	input_paths = {os.path.realpath(path_in): path_in for path_in, _ in path_pairs}
+	output_paths = {}
+
+	for path_in, path_out in path_pairs:
+		real_path_out = os.path.realpath(path_out)
+
+		if real_path_out in input_paths:
+			parser.error("The output file " + path_out + " for " + path_in + " is also an input file " + input_paths[real_path_out] + ".")
+
+		if real_path_out in output_paths:
+			parser.error("The inputs " + output_paths[real_path_out] + " and " + path_in + " would both be written to " + path_out + ".")
+
+		output_paths[real_path_out] = path_in
+
+	argument_list = [(arguments.command, arguments.mode, path_in, path_out, arguments.key, arguments.block_size, arguments.chunk_size, arguments.backend, header) for path_in, path_out in path_pairs]
+
+	exit_code = 0
+
+	for path_in, path_out, byte_count, result in run_chunks_as_completed(process_file, argument_list, jobs=arguments.jobs):
+		if isinstance(result, str):
+			print(path_in + ": error: " + result, file=sys.stderr)
+			exit_code = 1
+		else:
+			print(path_in + " -> " + path_out + ": " + str(byte_count) + " bytes in " + format(result, ".3f") + "s (" + format(byte_count / result / 1e6 if result > 0 else 0.0, ".2f") + " MB/s)")
+
+	return exit_code
+
+# Instrumentation is opt-in, and works by replacing the module level functions named in instrumented_stages with wrappers which record statistics before calling the original function. Calls between the functions in this module look up the functions by name at call time, so they go through the wrappers too. When instrumentation is disabled the original functions are restored, so there is no overhead at all. It can be enabled with enable_instrumentation(), the instrument() context manager, or by setting the TEA_INSTRUMENT environment variable (with TEA_INSTRUMENT_OUTPUT set to a path to write a JSON snapshot to on exit). Statistics are only collected for the current process, not worker processes.
+instrumented_stages = ("string_to_int_list", "int_list_to_string", "generate_blocks", "encrypt_xor_vector", "decrypt_xor_vector", "encrypt_int_list", "decrypt_int_list", "cipher_block_chaining_encrypt", "cipher_block_chaining_decrypt")
+
+# The statistics recorded for each stage. 'ints' is the number of ints (or characters for string_to_int_list()) in the first argument, and 'blocks' the number of TEA blocks they make up. 'seconds' is cumulative, so it includes the time spent in the stages called by the stage.
+stage_statistics = {stage: {"calls": 0, "ints": 0, "blocks": 0, "seconds": 0.0} for stage in instrumented_stages}
+original_stage_functions = {}
+instrumentation_depth = 0
+
+# Creates the wrapper recording the statistics for a stage.
+def create_instrumented_wrapper(stage : str, function):
+	statistics = stage_statistics[stage]
+	first_parameter = next(iter(inspect.signature(function).parameters))
+
+	@functools.wraps(function)
+	def wrapper(*args, **kwargs):
+		# The size is measured before the call (some stages pad their input in place), and skipped if the first argument is missing or has no length, so the call itself raises the error instead of the wrapper.
+		try:
+			int_count = len(args[0] if len(args) > 0 else kwargs[first_parameter])
+		except (KeyError, TypeError):
+			int_count = 0
+
+		start = time.perf_counter()
+
+		try:
+			return function(*args, **kwargs)
+		finally:
+			statistics["seconds"] += time.perf_counter() - start
+			statistics["calls"] += 1
+			statistics["ints"] += int_count
+			statistics["blocks"] += (int_count + 1) // 2
+
+	return wrapper
+
+# Enables instrumentation. Calls can be nested, and instrumentation stays enabled until disable_instrumentation() has been called the same number of times.
+def enable_instrumentation():
+	global instrumentation_depth
+
+	instrumentation_depth += 1
+
+	if instrumentation_depth > 1:
+		return
+
+	module_globals = globals()
+	for stage in instrumented_stages:
+		original_stage_functions[stage] = module_globals[stage]
+		module_globals[stage] = create_instrumented_wrapper(stage, module_globals[stage])
+
+def disable_instrumentation():
+	global instrumentation_depth
+
+	if instrumentation_depth == 0:
+		return
+
+	instrumentation_depth -= 1
+
+	if instrumentation_depth > 0:
+		return
+
+	module_globals = globals()
+	for stage in instrumented_stages:
+		module_globals[stage] = original_stage_functions.pop(stage)
+
+def is_instrumentation_enabled():
+	return instrumentation_depth > 0
+
+def reset_instrumentation():
+	for statistics in stage_statistics.values():
+		statistics["calls"] = 0
+		statistics["ints"] = 0
+		statistics["blocks"] = 0
+		statistics["seconds"] = 0.0
+
+# Returns a copy of the recorded statistics for every stage, including the number of TEA blocks and bytes processed and the throughput in bytes per second.
+def get_instrumentation_snapshot():
+	snapshot = {}
+
+	for stage, statistics in stage_statistics.items():
+		byte_count = 4 * statistics["ints"]
+
+		snapshot[stage] = {
+			"calls": statistics["calls"],
+			"blocks": statistics["blocks"],
+			"bytes": byte_count,
+			"seconds": statistics["seconds"],
+			"bytes_per_second": byte_count / statistics["seconds"] if statistics["seconds"] > 0 else 0.0,
+		}
+
+	return snapshot
+
+def get_instrumentation_json(indent : int = 2):
+	return json.dumps(get_instrumentation_snapshot(), indent=indent)
+
+# The object returned by the instrument() context manager. 'snapshot' holds the statistics recorded inside the block once it exits, and 'profiler' holds the cProfile.Profile if profiling was requested.
+class InstrumentationSession:
+	def __init__(self, profiler : cProfile.Profile = None):
+		self.profiler = profiler
+		self.snapshot = None
+
+	def to_json(self, indent : int = 2):
+		return json.dumps(self.snapshot if self.snapshot is not None else get_instrumentation_snapshot(), indent=indent)
+
+	# Prints the cProfile statistics sorted by cumulative time, if profiling was requested.
+	def print_profile(self, sort : str = "cumulative", limit : int = 20):
+		if self.profiler is not None:
+			pstats.Stats(self.profiler).sort_stats(sort).print_stats(limit)
+
+# Enables instrumentation for the duration of a with block, resetting the statistics on entry. If 'profile' is True, the block is also run under cProfile.
+@contextlib.contextmanager
+def instrument(profile : bool = False):
+	session = InstrumentationSession(cProfile.Profile() if profile else None)
+
+	reset_instrumentation()
+	enable_instrumentation()
+
+	if session.profiler is not None:
+		session.profiler.enable()
+
+	try:
+		yield session
+	finally:
+		if session.profiler is not None:
+			session.profiler.disable()
+
+		disable_instrumentation()
+		session.snapshot = get_instrumentation_snapshot()
+
+# Writes the statistics to the path in TEA_INSTRUMENT_OUTPUT when the process exits, if instrumentation was enabled using TEA_INSTRUMENT.
+def write_instrumentation_output():
+	output_path = os.environ.get("TEA_INSTRUMENT_OUTPUT")
+
+	if output_path:
+		with open(output_path, "w") as output_file:
+			output_file.write(get_instrumentation_json())
+
+if os.environ.get("TEA_INSTRUMENT", "") not in ("", "0"):
+	enable_instrumentation()
+	atexit.register(write_instrumentation_output)
+
 if __name__ == "__main__":
-	main()
+	sys.exit(command_line_main())